@@ -0,0 +1,147 @@
+"""Measure validation of cases ids of collected tests.
+
+Each collected test is checked against index of project cases, so
+validation must stay linear in number of tests. Benchmark validates
+synthetic collected tests (each of them is marked with its own case) in
+process, without pytest session, and reports time of validation, time of
+building of cases index and memory used by index:
+
+    python -m benchmarks.cases_validation --sizes 10000 50000 100000
+
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+import types
+import typing
+
+import pytest
+
+from pytest_qaseio import cases_index, converter
+
+PROJECT_CODE = "BENCH"
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.cases_validation",
+        description="Measure validation of cases ids of collected tests",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10000, 50000, 100000],
+        help="Numbers of collected tests",
+    )
+    parser.add_argument(
+        "--cases",
+        type=int,
+        default=20000,
+        help=(
+            "Number of cases in project, it's increased to number of tests "
+            "if it's smaller"
+        ),
+    )
+    return parser.parse_args(argv)
+
+
+def generate_items(tests_count: int) -> list[pytest.Function]:
+    """Generate lightweight stand-ins of collected tests.
+
+    Only attributes used by converter are provided.
+
+    """
+    return [
+        typing.cast(
+            pytest.Function,
+            types.SimpleNamespace(
+                nodeid=f"test_generated.py::test_{index}",
+                name=f"test_{index}",
+                location=("test_generated.py", index, f"test_{index}"),
+                own_markers=[
+                    pytest.mark.qase(
+                        f"https://app.qase.io/case/{PROJECT_CODE}-{index}",
+                    ).mark,
+                ],
+                stash=pytest.Stash(),
+            ),
+        )
+        for index in range(1, tests_count + 1)
+    ]
+
+
+def measure_size(build: typing.Callable[[], typing.Any]) -> float:
+    """Build object and return size of memory kept by it in KB."""
+    tracemalloc.start()
+    try:
+        built = build()  # noqa: F841
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return size / 1024
+
+
+def run_scenario(tests_count: int, cases_count: int) -> dict[str, typing.Any]:
+    """Build cases index and validate cases ids of collected tests."""
+    cases_ids = list(range(1, max(cases_count, tests_count) + 1))
+    items = generate_items(tests_count)
+
+    started_at = time.perf_counter()
+    cases_ids_index = cases_index.CasesIndex(cases_ids)
+    build_time = time.perf_counter() - started_at
+    # Ids are created while index is built, like ones loaded from API
+    index_size = measure_size(
+        lambda: cases_index.CasesIndex(range(1, len(cases_ids) + 1)),
+    )
+    frozenset_size = measure_size(
+        lambda: frozenset(range(1, len(cases_ids) + 1)),
+    )
+
+    qase_converter = converter.QaseConverter(
+        browser="chrome",
+        env="benchmark",
+        project_code=PROJECT_CODE,
+        file_storage=None,
+        # Config is used only to call hooks, which aren't called here
+        config=typing.cast(pytest.Config, None),
+    )
+    started_at = time.perf_counter()
+    qase_converter._prepare_cases_for_run(
+        cases_ids_from_api=cases_ids_index,
+        items=items,
+    )
+    validation_time = time.perf_counter() - started_at
+    return {
+        "tests": tests_count,
+        "cases": len(cases_ids),
+        "validation_s": round(validation_time, 3),
+        "index_build_s": round(build_time, 3),
+        "index_kb": round(index_size, 1),
+        "frozenset_kb": round(frozenset_size, 1),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Measure validation of cases ids for each size of test suite."""
+    args = parse_args(argv)
+    columns = (
+        "tests",
+        "cases",
+        "validation_s",
+        "index_build_s",
+        "index_kb",
+        "frozenset_kb",
+    )
+    print(" | ".join(columns))  # noqa: T201
+    for tests_count in sorted(args.sizes):
+        result = run_scenario(tests_count=tests_count, cases_count=args.cases)
+        print(" | ".join(str(result[column]) for column in columns))  # noqa: T201
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Check import-time budget of plugin when reporting to Qase is disabled.
+
+Plugin is loaded by pytest on every run via entry point, so it must not
+import heavy dependencies unless `--qase-enabled` is passed:
+
+    python -m benchmarks.import_time --budget-ms=50
+
+Command exits with non-zero code if budget is exceeded or any of heavy
+dependencies is imported by pytest session without `--qase-enabled`.
+
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import typing
+
+# Dependencies which should be imported only when plugin is enabled
+HEAVY_MODULES = ("qase", "filelock", "tenacity", "arrow", "pydantic")
+
+# Script measures import of plugin (after pytest itself is imported) and
+# collects modules imported by pytest session with disabled plugin
+MEASURE_SCRIPT = """
+import json
+import sys
+import time
+
+import pytest
+
+started_at = time.perf_counter()
+import pytest_qaseio.plugin
+
+import_time = time.perf_counter() - started_at
+
+
+class ModulesCollector:
+    def pytest_unconfigure(self):
+        self.modules = sorted(
+            {{name.split(".")[0] for name in sys.modules}}
+            & set({heavy_modules!r})
+        )
+
+
+collector = ModulesCollector()
+pytest.main(
+    ["--collect-only", "-q", "-p", "no:cacheprovider", "--noconftest"],
+    plugins=[collector],
+)
+print(json.dumps({{"import_time": import_time, "modules": collector.modules}}))
+"""
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.import_time",
+        description="Check import-time budget of disabled plugin",
+    )
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=50,
+        help="Max time of import of plugin in milliseconds",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=5,
+        help="Number of measurements, the best one is compared with budget",
+    )
+    return parser.parse_args(argv)
+
+
+def measure() -> dict[str, typing.Any]:
+    """Measure import of plugin in fresh interpreter."""
+    output = subprocess.run(  # noqa: S603
+        [
+            sys.executable,
+            "-c",
+            MEASURE_SCRIPT.format(heavy_modules=HEAVY_MODULES),
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Check import time and imported modules of disabled plugin."""
+    args = parse_args(argv)
+    measurements = [measure() for _ in range(args.runs)]
+    import_time_ms = (
+        min(measurement["import_time"] for measurement in measurements) * 1000
+    )
+    heavy_modules = measurements[0]["modules"]
+    print(f"Import of plugin: {import_time_ms:.1f}ms")  # noqa: T201
+    failed = False
+    if import_time_ms > args.budget_ms:
+        print(f"Budget of {args.budget_ms}ms is exceeded")  # noqa: T201
+        failed = True
+    if heavy_modules:
+        print(  # noqa: T201
+            f"Disabled plugin imported heavy modules: "
+            f"{', '.join(heavy_modules)}",
+        )
+        failed = True
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
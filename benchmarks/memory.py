@@ -0,0 +1,195 @@
+"""Check that memory used by plugin doesn't grow with size of test suite.
+
+Each xdist worker collects all tests, so any state plugin keeps per
+collected test is multiplied by number of workers. Benchmark runs sessions
+of growing size with and without plugin and compares peak RSS of workers:
+
+    python -m benchmarks.memory --sizes 10000 50000 100000 --max-growth-mb=20
+
+Command exits with non-zero code if memory used by plugin per worker on the
+largest suite exceeds memory used on the smallest one by more than
+`--max-growth-mb` megabytes.
+
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import pathlib
+import sys
+import tempfile
+import typing
+
+from .run import generate_tests, run_pytest
+from .stub_server import QaseStubServer
+
+# Each process of session (xdist worker or pytest itself without xdist)
+# saves its peak RSS, since RSS of separate workers isn't available to
+# process, which started pytest
+RSS_CONFTEST = """
+
+import json
+import os
+import pathlib
+import resource
+
+
+def pytest_sessionfinish(session):
+    if session.config.pluginmanager.has_plugin("dsession"):
+        # Controller of xdist workers doesn't run tests
+        return
+    pathlib.Path(
+        os.environ["QASE_BENCHMARK_RSS_DIR"],
+        f"{os.getpid()}.json",
+    ).write_text(
+        json.dumps(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss),
+    )
+"""
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.memory",
+        description="Check that memory used by plugin is flat",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10000, 50000, 100000],
+        help="Numbers of generated tests",
+    )
+    parser.add_argument(
+        "--xdist-workers",
+        type=int,
+        default=4,
+        help="Number of xdist workers, use 0 to run tests without xdist",
+    )
+    parser.add_argument(
+        "--fail-every",
+        type=int,
+        default=100,
+        help="Fail every n-th test to upload debug files, 0 to pass all",
+    )
+    parser.add_argument(
+        "--pytest-args",
+        default="",
+        help="Additional arguments for pytest, f.e. plugin options",
+    )
+    parser.add_argument(
+        "--max-growth-mb",
+        type=float,
+        default=20,
+        help="Max growth of memory used by plugin per worker in megabytes",
+    )
+    return parser.parse_args(argv)
+
+
+def measure_workers_rss(
+    path: pathlib.Path,
+    args: list[str],
+    env: dict[str, str],
+) -> float:
+    """Run pytest and return the largest peak RSS of workers in megabytes."""
+    with tempfile.TemporaryDirectory(prefix="qase-rss-") as rss_dir:
+        run_pytest(
+            path=path,
+            args=args,
+            env={**env, "QASE_BENCHMARK_RSS_DIR": rss_dir},
+        )
+        # `ru_maxrss` is in kilobytes on Linux
+        return (
+            max(
+                json.loads(rss_file.read_text())
+                for rss_file in pathlib.Path(rss_dir).glob("*.json")
+            )
+            / 1024
+        )
+
+
+def run_scenario(
+    server: QaseStubServer,
+    tests_count: int,
+    args: argparse.Namespace,
+) -> dict[str, typing.Any]:
+    """Measure memory used by workers with and without plugin."""
+    pytest_args = args.pytest_args.split()
+    if args.xdist_workers:
+        pytest_args += ["-n", str(args.xdist_workers)]
+    env = {
+        **os.environ,
+        "QASE_API_HOST": server.host,
+        "QASE_TOKEN": "benchmark",
+        "QASE_PROJECT_CODE": "BENCH",
+        "ENVIRONMENT": "benchmark",
+    }
+    with tempfile.TemporaryDirectory(prefix="qase-benchmark-") as tmp_dir:
+        path = pathlib.Path(tmp_dir)
+        generate_tests(
+            path=path,
+            tests_count=tests_count,
+            fail_every=args.fail_every,
+        )
+        with (path / "conftest.py").open(mode="a") as conftest:
+            conftest.write(RSS_CONFTEST)
+        baseline_rss = measure_workers_rss(
+            path=path,
+            args=pytest_args,
+            env=env,
+        )
+        peak_rss = measure_workers_rss(
+            path=path,
+            args=[*pytest_args, "--qase-enabled"],
+            env=env,
+        )
+    return {
+        "tests": tests_count,
+        "worker_peak_rss_mb": round(peak_rss, 1),
+        "baseline_worker_peak_rss_mb": round(baseline_rss, 1),
+        "plugin_rss_mb": round(peak_rss - baseline_rss, 1),
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Measure memory used by plugin and check its growth."""
+    args = parse_args(argv)
+    if args.xdist_workers and not importlib.util.find_spec("xdist"):
+        print("xdist isn't installed, tests are run without it")  # noqa: T201
+        args.xdist_workers = 0
+
+    results = []
+    with QaseStubServer(cases_count=max(args.sizes)) as server:
+        for tests_count in sorted(args.sizes):
+            results.append(
+                run_scenario(
+                    server=server,
+                    tests_count=tests_count,
+                    args=args,
+                ),
+            )
+            print(f"{tests_count} tests done", file=sys.stderr)  # noqa: T201
+
+    columns = (
+        "tests",
+        "baseline_worker_peak_rss_mb",
+        "worker_peak_rss_mb",
+        "plugin_rss_mb",
+    )
+    print(" | ".join(columns))  # noqa: T201
+    for result in results:
+        print(" | ".join(str(result[column]) for column in columns))  # noqa: T201
+
+    growth = results[-1]["plugin_rss_mb"] - results[0]["plugin_rss_mb"]
+    print(  # noqa: T201
+        f"Growth of memory used by plugin per worker: {growth:.1f}MB",
+    )
+    if growth > args.max_growth_mb:
+        print(f"Limit of {args.max_growth_mb}MB is exceeded")  # noqa: T201
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
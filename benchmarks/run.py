@@ -0,0 +1,316 @@
+"""Benchmark of reporting tests results to stub Qase server.
+
+Each scenario runs synthetic pytest session of generated tests in separate
+process twice: without plugin (baseline) and with `--qase-enabled`, so
+overhead of plugin can be calculated. Results can be saved to json file and
+compared with results of other commit:
+
+    python -m benchmarks.run --output=before.json
+    git checkout feature
+    python -m benchmarks.run --output=after.json --compare=before.json
+
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+import typing
+
+import pytest
+
+from .stub_server import QaseStubServer
+
+CONFTEST = """
+import base64
+
+import pytest
+
+
+class FakeWebDriver:
+    log_types = ["browser"]
+    current_url = "http://localhost/"
+    page_source = "<html></html>" * 1000
+
+    def get_screenshot_as_base64(self):
+        return base64.b64encode(b"screenshot" * 10000).decode()
+
+    def get_log(self, name):
+        return [{"timestamp": 0, "level": "INFO", "message": "message"}]
+
+
+def pytest_addoption(parser):
+    parser.addoption("--webdriver", default="chrome")
+
+
+@pytest.fixture(autouse=True)
+def webdriver(request):
+    request.node._webdriver = FakeWebDriver()
+"""
+
+TESTS_TEMPLATE = """
+import pytest
+
+
+@pytest.mark.parametrize(
+    "index",
+    [
+        pytest.param(
+            index,
+            marks=pytest.mark.qase(
+                f"https://app.qase.io/case/BENCH-{{index + 1}}",
+            ),
+            id=str(index),
+        )
+        for index in range({tests_count})
+    ],
+)
+def test_generated(index):
+    assert {fail_every} == 0 or index % {fail_every} != 0
+"""
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Benchmark reporting of results to stub Qase server",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 50000],
+        help="Numbers of generated tests",
+    )
+    parser.add_argument(
+        "--xdist-workers",
+        type=int,
+        default=4,
+        help="Number of xdist workers, use 0 to skip xdist scenarios",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        help="Latency of stub server responses in seconds",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        help="Probability of failed response of stub server",
+    )
+    parser.add_argument(
+        "--fail-every",
+        type=int,
+        default=100,
+        help="Fail every n-th test to upload debug files, 0 to pass all",
+    )
+    parser.add_argument(
+        "--pytest-args",
+        default="",
+        help="Additional arguments for pytest, f.e. plugin options",
+    )
+    parser.add_argument(
+        "--output",
+        type=pathlib.Path,
+        help="Save results to json file",
+    )
+    parser.add_argument(
+        "--compare",
+        type=pathlib.Path,
+        help="Compare results with results saved to json file",
+    )
+    return parser.parse_args(argv)
+
+
+def generate_tests(
+    path: pathlib.Path,
+    tests_count: int,
+    fail_every: int,
+) -> None:
+    """Generate tests, each of them is marked with its own case."""
+    (path / "conftest.py").write_text(CONFTEST)
+    (path / "test_generated.py").write_text(
+        TESTS_TEMPLATE.format(
+            tests_count=tests_count,
+            fail_every=fail_every,
+        ),
+    )
+
+
+def run_pytest(
+    path: pathlib.Path,
+    args: list[str],
+    env: dict[str, str],
+) -> tuple[float, float]:
+    """Run pytest and return wall time and peak RSS in megabytes.
+
+    Peak RSS is the largest RSS of pytest process and its children (f.e.
+    xdist workers).
+
+    """
+    started_at = time.perf_counter()
+    process = subprocess.Popen(  # noqa: S603
+        [sys.executable, "-m", "pytest", "-q", "-p", "no:randomly", *args],
+        cwd=path,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    _, status, usage = os.wait4(process.pid, 0)
+    wall_time = time.perf_counter() - started_at
+    process.returncode = os.waitstatus_to_exitcode(status)
+    # Tests are expected to fail, but not the session
+    if process.returncode not in (
+        pytest.ExitCode.OK,
+        pytest.ExitCode.TESTS_FAILED,
+    ):
+        raise RuntimeError(
+            f"pytest exited with {process.returncode} code, "
+            f"run it in {path} to check the error",
+        )
+    # `ru_maxrss` is in kilobytes on Linux
+    return wall_time, usage.ru_maxrss / 1024
+
+
+def run_scenario(
+    server: QaseStubServer,
+    tests_count: int,
+    xdist_workers: int,
+    args: argparse.Namespace,
+) -> dict[str, typing.Any]:
+    """Run benchmark of single session and return its results."""
+    pytest_args = args.pytest_args.split()
+    if xdist_workers:
+        pytest_args += ["-n", str(xdist_workers)]
+    env = {
+        **os.environ,
+        "QASE_API_HOST": server.host,
+        "QASE_TOKEN": "benchmark",
+        "QASE_PROJECT_CODE": "BENCH",
+        "ENVIRONMENT": "benchmark",
+    }
+    with tempfile.TemporaryDirectory(prefix="qase-benchmark-") as tmp_dir:
+        path = pathlib.Path(tmp_dir)
+        generate_tests(
+            path=path,
+            tests_count=tests_count,
+            fail_every=args.fail_every,
+        )
+        baseline_time, baseline_rss = run_pytest(
+            path=path,
+            args=pytest_args,
+            env=env,
+        )
+        server.reset()
+        wall_time, peak_rss = run_pytest(
+            path=path,
+            args=[*pytest_args, "--qase-enabled"],
+            env=env,
+        )
+    return {
+        "name": f"{tests_count} tests"
+        + (f", xdist {xdist_workers} workers" if xdist_workers else ""),
+        "tests": tests_count,
+        "xdist_workers": xdist_workers,
+        "wall_time": round(wall_time, 3),
+        "baseline_wall_time": round(baseline_time, 3),
+        "overhead_per_test_ms": round(
+            (wall_time - baseline_time) / tests_count * 1000,
+            3,
+        ),
+        "peak_rss_mb": round(peak_rss, 1),
+        "baseline_peak_rss_mb": round(baseline_rss, 1),
+        "requests": sum(server.requests.values()),
+        "requests_per_endpoint": dict(server.requests),
+        "results_received": server.results_count,
+    }
+
+
+def format_results(
+    results: list[dict[str, typing.Any]],
+    previous_results: list[dict[str, typing.Any]],
+) -> str:
+    """Format results as table with changes against previous results."""
+    previous = {result["name"]: result for result in previous_results}
+    columns = (
+        "wall_time",
+        "overhead_per_test_ms",
+        "peak_rss_mb",
+        "requests",
+    )
+    lines = [" | ".join(("scenario", *columns))]
+    for result in results:
+        cells = [result["name"]]
+        for column in columns:
+            cell = str(result[column])
+            if result["name"] in previous:
+                previous_value = previous[result["name"]][column]
+                cell = f"{cell} ({result[column] - previous_value:+.3f})"
+            cells.append(cell)
+        lines.append(" | ".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Run benchmarks and print results."""
+    args = parse_args(argv)
+    xdist_workers = [0]
+    if args.xdist_workers and importlib.util.find_spec("xdist"):
+        xdist_workers.append(args.xdist_workers)
+
+    results = []
+    with QaseStubServer(
+        cases_count=max(args.sizes),
+        latency=args.latency,
+        error_rate=args.error_rate,
+    ) as server:
+        for tests_count in args.sizes:
+            for workers in xdist_workers:
+                results.append(
+                    run_scenario(
+                        server=server,
+                        tests_count=tests_count,
+                        xdist_workers=workers,
+                        args=args,
+                    ),
+                )
+                print(results[-1]["name"], "done", file=sys.stderr)  # noqa: T201
+
+    previous_results = []
+    if args.compare:
+        previous_results = json.loads(args.compare.read_text())["results"]
+    print(format_results(results, previous_results))  # noqa: T201
+    if args.output:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "commit": subprocess.run(
+                        ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+                        capture_output=True,
+                        text=True,
+                        check=False,
+                    ).stdout.strip(),
+                    "options": {
+                        "latency": args.latency,
+                        "error_rate": args.error_rate,
+                        "fail_every": args.fail_every,
+                        "pytest_args": args.pytest_args,
+                    },
+                    "results": results,
+                },
+                indent=2,
+            ),
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+import collections
+import http
+import http.server
+import json
+import random
+import re
+import threading
+import time
+import typing
+import urllib.parse
+
+
+class QaseStubServer:
+    """In-process stand-in for Qase API endpoints used by plugin.
+
+    Server emulates paging of cases, creation of runs, creation of results
+    (single and bulk) and uploading of attachments. Each response can be
+    delayed by `latency` seconds and fails with `error_status` with
+    `error_rate` probability, which allows to check behavior of plugin on
+    slow and unstable Qase.
+
+    """
+
+    def __init__(
+        self,
+        cases_count: int,
+        latency: float = 0,
+        error_rate: float = 0,
+        error_status: int = http.HTTPStatus.SERVICE_UNAVAILABLE,
+    ) -> None:
+        """Prepare server on random free port."""
+        self.cases_count = cases_count
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # Number of requests per endpoint
+        self.requests: collections.Counter[str] = collections.Counter()
+        self.results_count = 0
+        self._lock = threading.Lock()
+        # Mapping of ids of created runs and their data
+        self.runs: dict[int, dict[str, typing.Any]] = {}
+        self._server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0),
+            self._get_handler_class(),
+        )
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever,
+            name="qase-stub-server",
+            daemon=True,
+        )
+
+    @property
+    def host(self) -> str:
+        """Return base URL of API to use as `QASE_API_HOST`."""
+        host, port = self._server.server_address[:2]
+        return f"http://{host!s}:{port}/v1"
+
+    def start(self) -> None:
+        """Start serving requests in background thread."""
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self) -> None:
+        """Reset statistics of requests."""
+        with self._lock:
+            self.requests.clear()
+            self.results_count = 0
+
+    def __enter__(self) -> typing.Self:
+        """Start server."""
+        self.start()
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        """Stop server."""
+        self.stop()
+
+    def handle(
+        self,
+        method: str,
+        path: str,
+        body: bytes,
+    ) -> tuple[int, dict[str, typing.Any]]:
+        """Return status and body of response to request."""
+        url = urllib.parse.urlsplit(path)
+        query = urllib.parse.parse_qs(url.query)
+        for endpoint_method, pattern, endpoint in self._endpoints:
+            match = re.fullmatch(pattern, url.path)
+            if endpoint_method != method or not match:
+                continue
+            with self._lock:
+                self.requests[endpoint.__name__.removeprefix("_")] += 1
+            if self.latency:
+                time.sleep(self.latency)
+            if random.random() < self.error_rate:  # noqa: S311
+                return self.error_status, {
+                    "status": False,
+                    "errorMessage": "Injected error",
+                }
+            return endpoint(self, match=match, query=query, body=body)
+        return http.HTTPStatus.NOT_FOUND, {
+            "status": False,
+            "errorMessage": "Unknown endpoint",
+        }
+
+    def _get_cases(
+        self,
+        match: re.Match[str],
+        query: dict[str, list[str]],
+        body: bytes,
+    ) -> tuple[int, dict[str, typing.Any]]:
+        limit = int(query.get("limit", ["10"])[0])
+        offset = int(query.get("offset", ["0"])[0])
+        cases_ids = range(
+            offset + 1,
+            min(offset + limit, self.cases_count) + 1,
+        )
+        return http.HTTPStatus.OK, {
+            "status": True,
+            "result": {
+                "total": self.cases_count,
+                "filtered": self.cases_count,
+                "count": len(cases_ids),
+                "entities": [{"id": case_id} for case_id in cases_ids],
+            },
+        }
+
+    def _get_case(
+        self,
+        match: re.Match[str],
+        query: dict[str, list[str]],
+        body: bytes,
+    ) -> tuple[int, dict[str, typing.Any]]:
+        case_id = int(match["id"])
+        if case_id > self.cases_count:
+            return http.HTTPStatus.NOT_FOUND, {
+                "status": False,
+                "errorMessage": "Test case not found",
+            }
+        return http.HTTPStatus.OK, {"status": True, "result": {"id": case_id}}
+
+    def _create_run(
+        self,
+        match: re.Match[str],
+        query: dict[str, list[str]],
+        body: bytes,
+    ) -> tuple[int, dict[str, typing.Any]]:
+        run_data = json.loads(body)
+        with self._lock:
+            run_id = len(self.runs) + 1
+            self.runs[run_id] = {
+                "id": run_id,
+                "title": run_data["title"],
+                "start_time": int(time.time()),
+                "cases": run_data.get("cases", []),
+            }
+        return http.HTTPStatus.OK, {"status": True, "result": {"id": run_id}}
+
+    def _get_runs(
+        self,
+        match: re.Match[str],
+        query: dict[str, list[str]],
+        body: bytes,
+    ) -> tuple[int, dict[str, typing.Any]]:
+        search = query.get("search", [""])[0]
+        from_start_time = int(query.get("from_start_time", ["0"])[0])
+        runs = [
+            {"id": run["id"], "title": run["title"]}
+            for run in self.runs.values()
+            if search in run["title"] and run["start_time"] >= from_start_time
+        ]
+        return http.HTTPStatus.OK, {
+            "status": True,
+            "result": {
+                "total": len(runs),
+                "filtered": len(runs),
+                "count": len(runs),
+                "entities": runs,
+            },
+        }
+
+    def _get_run(
+        self,
+        match: re.Match[str],
+        query: dict[str, list[str]],
+        body: bytes,
+    ) -> tuple[int, dict[str, typing.Any]]:
+        run = self.runs.get(int(match["id"]))
+        if not run:
+            return http.HTTPStatus.NOT_FOUND, {
+                "status": False,
+                "errorMessage": "Run not found",
+            }
+        return http.HTTPStatus.OK, {
+            "status": True,
+            "result": {"id": run["id"], "title": run["title"]},
+        }
+
+    def _create_result(
+        self,
+        match: re.Match[str],
+        query: dict[str, list[str]],
+        body: bytes,
+    ) -> tuple[int, dict[str, typing.Any]]:
+        result = json.loads(body)
+        with self._lock:
+            self.results_count += 1
+        return http.HTTPStatus.OK, {
+            "status": True,
+            "result": {"case_id": result.get("case_id"), "hash": "hash"},
+        }
+
+    def _create_result_bulk(
+        self,
+        match: re.Match[str],
+        query: dict[str, list[str]],
+        body: bytes,
+    ) -> tuple[int, dict[str, typing.Any]]:
+        results = json.loads(body)["results"]
+        with self._lock:
+            self.results_count += len(results)
+        return http.HTTPStatus.OK, {"status": True}
+
+    def _upload_attachment(
+        self,
+        match: re.Match[str],
+        query: dict[str, list[str]],
+        body: bytes,
+    ) -> tuple[int, dict[str, typing.Any]]:
+        files_count = max(body.count(b'name="file'), 1)
+        return http.HTTPStatus.OK, {
+            "status": True,
+            "result": [
+                {
+                    "hash": f"hash{index}",
+                    "filename": f"file{index}",
+                    "mime": "application/octet-stream",
+                    "extension": "",
+                    "url": f"{self.host}/attachment/hash{index}",
+                }
+                for index in range(files_count)
+            ],
+        }
+
+    _endpoints: typing.ClassVar = (
+        ("GET", r"/v1/case/(?P<code>\w+)", _get_cases),
+        ("GET", r"/v1/case/(?P<code>\w+)/(?P<id>\d+)", _get_case),
+        ("GET", r"/v1/run/(?P<code>\w+)", _get_runs),
+        ("POST", r"/v1/run/(?P<code>\w+)", _create_run),
+        ("GET", r"/v1/run/(?P<code>\w+)/(?P<id>\d+)", _get_run),
+        ("POST", r"/v1/result/(?P<code>\w+)/(?P<id>\d+)", _create_result),
+        (
+            "POST",
+            r"/v1/result/(?P<code>\w+)/(?P<id>\d+)/bulk",
+            _create_result_bulk,
+        ),
+        ("POST", r"/v1/attachment/(?P<code>\w+)", _upload_attachment),
+    )
+
+    def _get_handler_class(self) -> type[http.server.BaseHTTPRequestHandler]:
+        """Return class of request handler bound to server."""
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            # Keep connections alive like Qase does
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                self._respond()
+
+            def do_POST(self) -> None:
+                self._respond()
+
+            def _respond(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                status, response = stub.handle(
+                    method=self.command,
+                    path=self.path,
+                    body=body,
+                )
+                content = json.dumps(response).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                try:
+                    self.wfile.write(content)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Client stopped waiting for response (f.e. timed out)
+                    self.close_connection = True
+
+            def log_message(self, *args: typing.Any) -> None:
+                """Don't log requests."""
+
+        return Handler
@@ -1,19 +1,60 @@
-from . import (
-    api_client,
-    constants,
-    converter,
-    debug_info,
-    hooks,
-    plugin_exceptions,
-    storage,
-)
+import importlib
+import typing
+
+# Submodules are imported lazily, since package is imported by pytest on
+# every run via plugin entry point
+if typing.TYPE_CHECKING:
+    from . import (
+        api_client,
+        artifacts,
+        cases_cache,
+        cases_index,
+        constants,
+        converter,
+        debug_info,
+        files_cache,
+        hooks,
+        journal,
+        metrics,
+        plugin_exceptions,
+        qase_plugin,
+        rate_limiter,
+        results_aggregator,
+        results_buffer,
+        results_sender,
+        spool,
+        storage,
+        tests_cases,
+        truncation,
+    )
 
 __all__ = [
     "api_client",
+    "artifacts",
+    "cases_cache",
+    "cases_index",
     "constants",
     "converter",
     "debug_info",
+    "files_cache",
     "hooks",
+    "journal",
+    "metrics",
     "plugin_exceptions",
+    "qase_plugin",
+    "rate_limiter",
+    "results_aggregator",
+    "results_buffer",
+    "results_sender",
+    "spool",
     "storage",
+    "tests_cases",
+    "truncation",
 ]
+
+
+def __getattr__(name: str) -> typing.Any:
+    """Import submodule on first access."""
+    if name in __all__:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
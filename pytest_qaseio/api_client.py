@@ -1,7 +1,11 @@
 import collections.abc
+import concurrent.futures
 import functools
+import http
 import logging
+import socket
 import sys
+import time
 import typing
 
 import tenacity
@@ -10,25 +14,92 @@ from qase.api_client_v1.api.cases_api import CasesApi
 from qase.api_client_v1.api.results_api import ResultsApi
 from qase.api_client_v1.api.runs_api import RunsApi
 from qase.api_client_v1.api_client import ApiClient
+from qase.api_client_v1.exceptions import ApiException
 from qase.api_client_v1.models.id_response_all_of_result import (
     IdResponseAllOfResult,
 )
 from qase.api_client_v1.models.result_create import ResultCreate
+from qase.api_client_v1.models.result_create_bulk import ResultCreateBulk
 from qase.api_client_v1.models.run import Run
 from qase.api_client_v1.models.run_create import RunCreate
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import (
+    ConnectTimeoutError,
+    MaxRetryError,
+    NewConnectionError,
+)
+
+from . import cases_index, metrics, rate_limiter
 
 ReturnValue = typing.TypeVar("ReturnValue")
 FuncParams = typing.ParamSpec("FuncParams")
 
 
+@functools.cache
+def get_api_client(
+    token: str,
+    connection_pool_size: int | None = None,
+    host: str | None = None,
+) -> ApiClient:
+    """Return Qase API client shared within process.
+
+    Sharing client allows to reuse connections from its pool instead of
+    opening new connection (with TLS handshake) for every consumer.
+    Connections are kept alive with TCP keep-alive.
+
+    `host` allows to use other Qase API server instead of `api.qase.io`.
+
+    """
+    configuration = qaseio_config.Configuration(
+        host=host,
+        api_key={
+            "TokenAuth": token,
+        },
+    )
+    if connection_pool_size:
+        configuration.connection_pool_maxsize = connection_pool_size
+    configuration.socket_options = [  # type: ignore
+        *HTTPConnection.default_socket_options,
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    ]
+    return ApiClient(configuration=configuration)
+
+
+def get_connection_pool_stats(client: ApiClient) -> dict[str, int]:
+    """Return statistics of connection pools of Qase API client."""
+    stats = {
+        "connections": 0,
+        "requests": 0,
+    }
+    pools = client.rest_client.pool_manager.pools
+    for pool_key in pools.keys():  # noqa: SIM118
+        pool = pools.get(pool_key)
+        if pool is None:
+            continue
+        stats["connections"] += pool.num_connections
+        stats["requests"] += pool.num_requests
+    return stats
+
+
 class QaseClient:
     """Class for interacting with tests runs in Qase API."""
 
+    # Qase rejects bulk requests with more than 200 results with `413` error
+    bulk_results_limit = 200
+    # Run whose creation wasn't confirmed is looked up several times with
+    # doubling delay, since Qase can still be creating it
+    find_run_attempts = 4
+    find_run_delay = 2
+
     def __init__(
         self,
         token: str,
         project_code: str,
         retries: int,
+        connection_pool_size: int | None = None,
+        limiter: rate_limiter.RateLimiter | None = None,
+        api_metrics: metrics.ApiMetrics | None = None,
+        host: str | None = None,
     ) -> None:
         """Init client."""
         super().__init__()
@@ -36,19 +107,28 @@ class QaseClient:
         self._logger.addHandler(
             logging.StreamHandler(sys.stderr),
         )
-        self._client = ApiClient(
-            configuration=qaseio_config.Configuration(
-                api_key={
-                    "TokenAuth": token,
-                },
-            ),
+        self._client = get_api_client(
+            token=token,
+            connection_pool_size=connection_pool_size,
+            host=host,
         )
+        self._runs_api = RunsApi(self._client)
+        self._cases_api = CasesApi(self._client)
+        self._results_api = ResultsApi(self._client)
         self._project_code: str = project_code
         self._retries = retries
+        self._rate_limiter = limiter
+        self.metrics = api_metrics or metrics.ApiMetrics()
+
+    @property
+    def connection_pool_stats(self) -> dict[str, int]:
+        """Return statistics of connection pools used by client."""
+        return get_connection_pool_stats(self._client)
 
     def api_retry(
         self,
         function: collections.abc.Callable[FuncParams, ReturnValue],
+        idempotent: bool = True,
     ) -> collections.abc.Callable[FuncParams, ReturnValue]:
         """Retrying Qase API requests.
 
@@ -56,7 +136,26 @@ class QaseClient:
         large number of requests, so we added retries to
         all qase.io API requests.
 
+        Requests which weren't processed by Qase (connection failed or
+        request was throttled with `429` response) are always retried.
+        Other failures are retried only for idempotent requests, since
+        request could be processed by Qase (f.e. result could be created).
+
         """
+        wait_exponential = tenacity.wait_exponential()
+
+        def wait(retry_state: tenacity.RetryCallState) -> float:
+            if self._is_throttled(retry_state.outcome):
+                # Throttled requests wait in rate limiter if it's enabled,
+                # otherwise for time requested by Qase
+                if self._rate_limiter:
+                    return 0
+                retry_after = rate_limiter.RateLimiter.parse_retry_after(
+                    self._get_retry_after(retry_state.outcome),
+                )
+                if retry_after is not None:
+                    return retry_after
+            return wait_exponential(retry_state)
 
         @functools.wraps(function)
         def wrapper(
@@ -65,23 +164,124 @@ class QaseClient:
         ) -> ReturnValue:
             for retry in tenacity.Retrying(
                 stop=tenacity.stop_after_attempt(self._retries),
-                wait=tenacity.wait_exponential(),
+                wait=wait,
+                retry=tenacity.retry_if_exception(
+                    functools.partial(
+                        self._is_retryable_error,
+                        idempotent=idempotent,
+                    ),
+                ),
                 reraise=True,
             ):
                 with retry:
-                    return function(*args, **kwargs)
+                    if retry.retry_state.attempt_number > 1:
+                        self.metrics.record_retry(function.__name__)
+                    return self._send_request(function, *args, **kwargs)
 
             # Just hack for mypy "missing return statement" error
             raise ValueError("No raises and no return from Qase API")
 
         return wrapper
 
+    def _send_request(
+        self,
+        function: collections.abc.Callable[FuncParams, ReturnValue],
+        *args: FuncParams.args,
+        **kwargs: FuncParams.kwargs,
+    ) -> ReturnValue:
+        """Send request to Qase respecting rate limits and record metrics."""
+        if self._rate_limiter:
+            self._rate_limiter.acquire()
+        started_at = time.perf_counter()
+        try:
+            response = function(*args, **kwargs)
+        except Exception as error:
+            self.metrics.record(
+                operation=function.__name__,
+                duration=time.perf_counter() - started_at,
+                bytes_sent=self._get_payload_size(kwargs),
+                error=error,
+            )
+            if (
+                self._rate_limiter
+                and isinstance(error, ApiException)
+                and error.status == http.HTTPStatus.TOO_MANY_REQUESTS
+            ):
+                self._rate_limiter.throttle(
+                    retry_after=self._rate_limiter.parse_retry_after(
+                        (error.headers or {}).get("Retry-After"),
+                    ),
+                )
+            raise
+        self.metrics.record(
+            operation=function.__name__,
+            duration=time.perf_counter() - started_at,
+            bytes_sent=self._get_payload_size(kwargs),
+        )
+        if self._rate_limiter:
+            self._rate_limiter.on_success()
+        return response
+
+    @staticmethod
+    def _get_payload_size(kwargs: dict[str, typing.Any]) -> int:
+        """Return approximate size of request payload in bytes.
+
+        Size is calculated from request models, since API client doesn't
+        expose size of sent requests.
+
+        """
+        return sum(
+            len(value.to_json().encode("utf-8"))
+            for value in kwargs.values()
+            if hasattr(value, "to_json")
+        )
+
+    @staticmethod
+    def _is_throttled(outcome: tenacity.Future | None) -> bool:
+        """Check if request was rejected by Qase because of rate limits."""
+        if not outcome or not outcome.failed:
+            return False
+        error = outcome.exception()
+        return (
+            isinstance(error, ApiException)
+            and error.status == http.HTTPStatus.TOO_MANY_REQUESTS
+        )
+
+    @staticmethod
+    def _get_retry_after(outcome: tenacity.Future | None) -> str | None:
+        """Return `Retry-After` header of failed request."""
+        if not outcome or not outcome.failed:
+            return None
+        error = outcome.exception()
+        if not isinstance(error, ApiException):
+            return None
+        return (error.headers or {}).get("Retry-After")
+
+    @staticmethod
+    def _is_retryable_error(error: BaseException, idempotent: bool) -> bool:
+        """Check if failed request can be safely retried."""
+        if isinstance(error, ApiException):
+            if error.status == http.HTTPStatus.TOO_MANY_REQUESTS:
+                return True
+            # `0` status is used for SSL errors
+            return idempotent and (
+                not error.status
+                or error.status >= http.HTTPStatus.INTERNAL_SERVER_ERROR
+            )
+        if isinstance(error, MaxRetryError) and isinstance(
+            error.reason,
+            NewConnectionError | ConnectTimeoutError,
+        ):
+            # Request wasn't sent
+            return True
+        return idempotent
+
     def get_run(
         self,
         run_id: int,
     ) -> Run:
         """Get test run from Qase."""
-        run_response = self.api_retry(RunsApi(self._client).get_run)(
+        run_response = self.api_retry(self._runs_api.get_run)(
             code=self._project_code,
             id=run_id,
         )
@@ -90,25 +290,112 @@ class QaseClient:
     def create_run(
         self,
         run_data: RunCreate,
+        timeout: float | None = None,
     ) -> Run:
-        """Create test run in Qase."""
-        response = self.api_retry(RunsApi(self._client).create_run)(
-            code=self._project_code,
-            run_create=run_data,
+        """Create test run in Qase.
+
+        Run with tens of thousands of cases is created slowly, so request
+        can time out or fail on Qase side, while run is actually created.
+        Since creation of run isn't idempotent, such run is looked up by
+        title several times before repeating the request. This makes
+        duplication of run unlikely, but doesn't prevent it, if Qase creates
+        run after all lookups.
+
+        """
+        create_run = self.api_retry(
+            self._runs_api.create_run,
+            idempotent=False,
         )
-        created_run = typing.cast(IdResponseAllOfResult, response.result)
+        started_at = time.time()
+        self._logger.info(
+            f"Creating test run with {len(run_data.cases or [])} cases",
+        )
+        for attempt in range(1, self._retries + 1):
+            try:
+                response = create_run(
+                    code=self._project_code,
+                    run_create=run_data,
+                    _request_timeout=timeout,
+                )
+            except Exception as error:
+                if attempt == self._retries or not self._is_retryable_error(
+                    error,
+                    idempotent=True,
+                ):
+                    raise
+                self._logger.warning(
+                    "Unable to confirm creation of test run "
+                    f"({metrics.ApiMetrics.get_error_class(error)}), "
+                    f"looking for created run",
+                )
+                if run := self._wait_for_run(
+                    title=run_data.title,
+                    started_after=started_at,
+                ):
+                    self._logger.info(f"Found created test run {run.id}")
+                    return run
+                continue
+            created_run = typing.cast(IdResponseAllOfResult, response.result)
+            self._logger.info(
+                f"Created test run {created_run.id} in "
+                f"{time.time() - started_at:.1f}s",
+            )
+            return self.get_run(typing.cast(int, created_run.id))
+
+        # Just hack for mypy "missing return statement" error
+        raise ValueError("No raises and no return from Qase API")
+
+    def _wait_for_run(
+        self,
+        title: str,
+        started_after: float,
+    ) -> Run | None:
+        """Look up run whose creation wasn't confirmed.
+
+        Run could be still being created by Qase after request timed out, so
+        it's looked up several times before request is repeated.
+
+        """
+        delay = self.find_run_delay
+        for attempt in range(self.find_run_attempts):
+            if attempt:
+                time.sleep(delay)
+                delay *= 2
+            if run := self._find_run(title=title, started_after=started_after):
+                return run
+        return None
 
-        return self.get_run(typing.cast(int, created_run.id))
+    def _find_run(
+        self,
+        title: str,
+        started_after: float,
+    ) -> Run | None:
+        """Find the latest run with title started after specified time."""
+        response = self.api_retry(self._runs_api.get_runs)(
+            code=self._project_code,
+            search=title,
+            # Allow some clock skew between Qase and current machine
+            from_start_time=int(started_after) - 60,
+            limit=100,
+        )
+        runs = [
+            run
+            for run in getattr(response.result, "entities", None) or []
+            if run.title == title
+        ]
+        if not runs:
+            return None
+        return max(runs, key=lambda run: run.id or 0)
 
     def load_cases_ids(
         self,
-    ) -> list[int]:
+    ) -> cases_index.CasesIndex:
         """Load all cases ids of project."""
         limit = 100
         cases: list[int] = []
 
         while True:
-            response = self.api_retry(CasesApi(self._client).get_cases)(
+            response = self.api_retry(self._cases_api.get_cases)(
                 code=self._project_code,
                 limit=limit,
                 offset=len(cases),
@@ -118,7 +405,48 @@ class QaseClient:
             cases += new_cases
             if not new_cases:
                 break
-        return cases
+        return cases_index.CasesIndex(cases)
+
+    def load_existing_cases_ids(
+        self,
+        cases_ids: collections.abc.Collection[int],
+        max_workers: int = 10,
+    ) -> cases_index.CasesIndex:
+        """Load specified cases from project and return ids of existing ones.
+
+        Unlike `load_cases_ids`, amount of requests depends only on amount of
+        specified cases, not on size of project.
+
+        """
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_workers,
+        ) as executor:
+            cases_exist = executor.map(self._case_exists, cases_ids)
+            return cases_index.CasesIndex(
+                case_id
+                for case_id, case_exists in zip(
+                    cases_ids,
+                    cases_exist,
+                    strict=True,
+                )
+                if case_exists
+            )
+
+    def _case_exists(
+        self,
+        case_id: int,
+    ) -> bool:
+        """Check if case exists in project."""
+        try:
+            self.api_retry(self._cases_api.get_case)(
+                code=self._project_code,
+                id=case_id,
+            )
+        except ApiException as error:
+            if error.status == http.HTTPStatus.NOT_FOUND:
+                return False
+            raise
+        return True
 
     def report_test_results(
         self,
@@ -126,7 +454,10 @@ class QaseClient:
         report_data: ResultCreate,
     ) -> tuple[str, ResultCreate]:
         """Report test results back to Qase."""
-        create_result = self.api_retry(ResultsApi(self._client).create_result)
+        create_result = self.api_retry(
+            self._results_api.create_result,
+            idempotent=False,
+        )
         result = create_result(
             code=self._project_code,
             id=typing.cast(int, run.id),
@@ -137,3 +468,27 @@ class QaseClient:
             ResultCreate,
             report_data.status,
         )
+
+    def report_test_results_bulk(
+        self,
+        run: Run,
+        results: list[ResultCreate],
+    ) -> None:
+        """Report multiple test results back to Qase via bulk endpoint.
+
+        Results are split into chunks, since Qase limits number of results
+        in a single bulk request.
+
+        """
+        create_result_bulk = self.api_retry(
+            self._results_api.create_result_bulk,
+            idempotent=False,
+        )
+        for start in range(0, len(results), self.bulk_results_limit):
+            create_result_bulk(
+                code=self._project_code,
+                id=typing.cast(int, run.id),
+                result_create_bulk=ResultCreateBulk(
+                    results=results[start : start + self.bulk_results_limit],
+                ),
+            )
@@ -0,0 +1,234 @@
+import gzip
+import importlib.util
+import io
+import logging
+import pathlib
+import shutil
+import tempfile
+import threading
+import typing
+
+from . import plugin_exceptions
+
+# Extensions of files which are processed
+IMAGES_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+TEXT_EXTENSIONS = (".html", ".txt", ".log")
+
+# Mapping of images formats and extensions of files
+IMAGES_FORMATS = {
+    "png": ".png",
+    "webp": ".webp",
+    "jpeg": ".jpg",
+}
+
+
+class ArtifactsProcessor:
+    """Reduce size of debug files before they are uploaded to file storage.
+
+    Screenshots are transcoded to chosen format and downscaled to max size,
+    text files (HTML, logs) are compressed with gzip. Processed file is
+    uploaded only if it's smaller than original one.
+
+    Processing of images requires `Pillow`, which is installed with
+    `pytest-qaseio[images]`.
+
+    """
+
+    def __init__(
+        self,
+        image_format: str = "png",
+        image_quality: int = 80,
+        max_image_size: int = 0,
+        compress_text: bool = False,
+        tmp_dir: pathlib.Path | None = None,
+    ) -> None:
+        """Check that `Pillow` is installed if images are processed.
+
+        Files processed by `process_file` are written to temporary files in
+        `tmp_dir` (system temporary directory by default).
+
+        """
+        self.image_format = image_format
+        self.image_quality = image_quality
+        self.max_image_size = max_image_size
+        self.compress_text = compress_text
+        self.tmp_dir = tmp_dir
+        if self.processes_images and not importlib.util.find_spec("PIL"):
+            raise plugin_exceptions.MissingDependency(
+                message=(
+                    "Pillow is required to process screenshots, install it "
+                    "with `pip install pytest-qaseio[images]`"
+                ),
+            )
+        self.logger = logging.getLogger("qase")
+        # Sizes of processed files before and after processing
+        self.bytes_before = 0
+        self.bytes_after = 0
+        self._lock = threading.Lock()
+
+    @property
+    def processes_images(self) -> bool:
+        """Check if images are processed."""
+        return self.image_format != "png" or self.max_image_size > 0
+
+    @property
+    def enabled(self) -> bool:
+        """Check if any files are processed."""
+        return self.processes_images or self.compress_text
+
+    @property
+    def bytes_saved(self) -> int:
+        """Return number of bytes saved by processing."""
+        return self.bytes_before - self.bytes_after
+
+    def process(self, content: bytes, filename: str) -> tuple[bytes, str]:
+        """Return processed content of file and its new filename.
+
+        If file can't be processed or processing doesn't make it smaller,
+        original file is returned.
+
+        """
+        output = io.BytesIO()
+        processed_filename = self._process(
+            source=io.BytesIO(content),
+            output=output,
+            filename=filename,
+        )
+        if processed_filename is None:
+            return content, filename
+        return output.getvalue(), processed_filename
+
+    def process_file(
+        self,
+        file: typing.BinaryIO,
+        filename: str,
+    ) -> tuple[typing.BinaryIO, str]:
+        """Return processed file object and its new filename.
+
+        Processed file is written to temporary file, which is removed once
+        it's closed by caller. If file can't be processed or processing
+        doesn't make it smaller, original file object is returned.
+
+        """
+        if not self._get_processing(filename):
+            return file, filename
+        position = file.tell()
+        # Temporary file is closed by caller
+        output = typing.cast(
+            typing.BinaryIO,
+            tempfile.TemporaryFile(  # noqa: SIM115
+                dir=self.tmp_dir,
+                prefix="qase-",
+            ),
+        )
+        processed_filename = self._process(
+            source=file,
+            output=output,
+            filename=filename,
+        )
+        if processed_filename is None:
+            output.close()
+            file.seek(position)
+            return file, filename
+        output.seek(0)
+        return output, processed_filename
+
+    def merge(self, bytes_before: int, bytes_after: int) -> None:
+        """Add sizes of files processed by other process."""
+        with self._lock:
+            self.bytes_before += bytes_before
+            self.bytes_after += bytes_after
+
+    def _get_processing(self, filename: str) -> str | None:
+        """Get kind of processing of file, `None` if it isn't processed."""
+        extension = pathlib.PurePosixPath(filename).suffix.lower()
+        if extension in IMAGES_EXTENSIONS and self.processes_images:
+            return "image"
+        if extension in TEXT_EXTENSIONS and self.compress_text:
+            return "text"
+        return None
+
+    def _process(
+        self,
+        source: typing.BinaryIO,
+        output: typing.BinaryIO,
+        filename: str,
+    ) -> str | None:
+        """Write processed file to output and return its new filename.
+
+        `None` is returned if file isn't processed or processed file isn't
+        smaller than original one.
+
+        """
+        processing = self._get_processing(filename)
+        if not processing:
+            return None
+        position = source.tell()
+        try:
+            if processing == "image":
+                processed_filename = self._process_image(
+                    source=source,
+                    output=output,
+                    filename=filename,
+                )
+            else:
+                processed_filename = self._compress_text(
+                    source=source,
+                    output=output,
+                    filename=filename,
+                )
+        except Exception:
+            self.logger.exception(msg=f"Can't process {filename}")
+            return None
+
+        size_before = source.seek(0, io.SEEK_END) - position
+        size_after = output.tell()
+        if size_after >= size_before:
+            return None
+        with self._lock:
+            self.bytes_before += size_before
+            self.bytes_after += size_after
+        return processed_filename
+
+    @staticmethod
+    def _compress_text(
+        source: typing.BinaryIO,
+        output: typing.BinaryIO,
+        filename: str,
+    ) -> str:
+        """Compress text file with gzip."""
+        with gzip.GzipFile(fileobj=output, mode="wb") as compressed_file:
+            shutil.copyfileobj(source, compressed_file)
+        return f"{filename}.gz"
+
+    def _process_image(
+        self,
+        source: typing.BinaryIO,
+        output: typing.BinaryIO,
+        filename: str,
+    ) -> str:
+        """Downscale image and transcode it to chosen format."""
+        from PIL import Image
+
+        with Image.open(source) as image:
+            if self.max_image_size:
+                # Aspect ratio is kept, smaller images aren't changed
+                image.thumbnail((self.max_image_size, self.max_image_size))
+            # JPEG doesn't support transparency
+            converted_image = (
+                image.convert("RGB")
+                if self.image_format == "jpeg"
+                and image.mode not in ("RGB", "L")
+                else image
+            )
+            converted_image.save(
+                output,
+                format=self.image_format.upper(),
+                quality=self.image_quality,
+                optimize=True,
+            )
+        return str(
+            pathlib.PurePosixPath(filename).with_suffix(
+                IMAGES_FORMATS[self.image_format],
+            ),
+        )
@@ -0,0 +1,62 @@
+import json
+import pathlib
+import tempfile
+import time
+
+from . import cases_index
+
+
+class CasesCache:
+    """On-disk cache of project's cases ids.
+
+    Cache is stored as json file per project, file is replaced atomically,
+    so it's safe to share it between several processes (f.e. xdist workers).
+
+    """
+
+    def __init__(
+        self,
+        cache_dir: pathlib.Path,
+        project_code: str,
+        ttl: float,
+    ) -> None:
+        """Init cache."""
+        self._path = cache_dir / f"cases-{project_code}.json"
+        self._ttl = ttl
+
+    def load(self) -> cases_index.CasesIndex | None:
+        """Load cases ids from cache.
+
+        Return `None` if cache is missing, broken or expired.
+
+        """
+        try:
+            with self._path.open() as cache_file:
+                cache = json.load(cache_file)
+            created_at = float(cache["created_at"])
+            cases_ids = cases_index.CasesIndex(
+                int(case_id) for case_id in cache["cases_ids"]
+            )
+        except (OSError, ValueError, TypeError, KeyError):
+            return None
+        if time.time() - created_at > self._ttl:
+            return None
+        return cases_ids
+
+    def save(self, cases_ids: cases_index.CasesIndex) -> None:
+        """Save cases ids to cache."""
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="w",
+            dir=self._path.parent,
+            prefix=f"{self._path.name}.",
+            delete=False,
+        ) as cache_file:
+            json.dump(
+                {
+                    "created_at": time.time(),
+                    "cases_ids": list(cases_ids),
+                },
+                cache_file,
+            )
+        pathlib.Path(cache_file.name).replace(self._path)
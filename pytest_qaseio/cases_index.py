@@ -0,0 +1,44 @@
+import array
+import bisect
+import collections.abc
+
+
+class CasesIndex(collections.abc.Set[int]):
+    """Index of project's cases ids.
+
+    Cases ids are kept sorted in compact array of 4 bytes integers instead
+    of set of `int` objects, since index of project with tens of thousands
+    of cases is loaded by each xdist worker. Check whether case exists in
+    project, which is performed for every collected test, is binary search.
+
+    """
+
+    __slots__ = ("_cases_ids",)
+
+    def __init__(
+        self,
+        cases_ids: collections.abc.Iterable[int] = (),
+    ) -> None:
+        """Build index from cases ids."""
+        self._cases_ids = array.array("I", sorted(set(cases_ids)))
+
+    def __contains__(self, case_id: object) -> bool:
+        """Check if case exists in index."""
+        if not isinstance(case_id, int):
+            return False
+        index = bisect.bisect_left(self._cases_ids, case_id)
+        return (
+            index < len(self._cases_ids) and self._cases_ids[index] == case_id
+        )
+
+    def __iter__(self) -> collections.abc.Iterator[int]:
+        """Iterate over cases ids in ascending order."""
+        return iter(self._cases_ids)
+
+    def __len__(self) -> int:
+        """Return number of cases in index."""
+        return len(self._cases_ids)
+
+    def __repr__(self) -> str:
+        """Return short representation of index."""
+        return f"{type(self).__name__}(<{len(self)} cases>)"
@@ -3,6 +3,12 @@ REPORT_FOLDER_TEMPLATE = "{env}/{browser}/run-{id}/{test_name}"
 
 TEST_PASSED = "Test Passed"
 TEST_FAILED = "Test Failed, on `{when}`"
+AGGREGATED_TESTS = "{passed} of {total} parametrized tests passed"
+TRUNCATED_TEXT = "\n\n... {size} bytes truncated ...\n\n"
+FULL_TEXT_LINK = "* Full {name}: [{filename}]({url})"
+
+# Statuses of results from the worst to the best one
+RESULTS_STATUSES = ("failed", "blocked", "skipped", "passed")
 
 FAILED_TEST_REPORT_TEMPLATE = """
 ---
@@ -14,3 +20,8 @@ FAILED_TEST_REPORT_TEMPLATE = """
 
 ---
 """
+
+# xdist distribution modes, which run all tests of case in the same worker,
+# so their results can be aggregated (`no` is used without xdist).
+# `loadgroup` isn't here, since it spreads ungrouped tests across workers
+AGGREGATION_DIST_MODES = ("no", "loadscope", "loadfile")
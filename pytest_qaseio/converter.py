@@ -1,12 +1,23 @@
 import collections
 import logging
+import re
 import sys
+import time
 
 import pytest
 from qase.api_client_v1.models.result_create import ResultCreate
 from qase.api_client_v1.models.run_create import RunCreate
 
-from . import constants, plugin_exceptions, storage
+from . import (
+    cases_index,
+    constants,
+    metrics,
+    plugin_exceptions,
+    results_aggregator,
+    storage,
+    tests_cases,
+    truncation,
+)
 
 
 class QaseConverter:
@@ -19,8 +30,14 @@ class QaseConverter:
         project_code: str,
         file_storage: storage.FileStorage | None,
         config: pytest.Config,
+        api_metrics: metrics.ApiMetrics | None = None,
     ) -> None:
-        """Init converter."""
+        """Init converter.
+
+        If metrics are passed, time of capturing debug info of failed tests
+        is recorded in them.
+
+        """
         super().__init__()
         self._logger = logging.getLogger("qase")
         self._logger.addHandler(
@@ -31,12 +48,26 @@ class QaseConverter:
         self._project_code = project_code
         self._file_storage = file_storage
         self._config = config
+        self._metrics = api_metrics
+        self._case_url_pattern = re.compile(
+            rf"{re.escape(project_code)}-(?P<case_id>\d+)\Z",
+        )
+        # Mapping of pytest items ids and their qase markers and case ids,
+        # since items are handled several times (validation, run creation).
+        # It's cleared once tests are mapped to cases
+        self._items_cases: dict[
+            str,
+            tuple[pytest.Mark | None, int | None],
+        ] = {}
+        # Mapping of ids of qase markers and case ids, since parametrized
+        # tests share single marker between all their items
+        self._markers_cases: dict[int, int | None] = {}
 
     def prepare_run_data(
         self,
-        cases_ids_from_api: list[int],
+        cases_ids_from_api: cases_index.CasesIndex,
         items: list[pytest.Function],
-    ) -> tuple[RunCreate, dict[str, int | None]]:
+    ) -> tuple[RunCreate, tests_cases.TestsCases]:
         """Prepare data needed to create test run."""
         cases, tests = self._prepare_cases_for_run(
             cases_ids_from_api=cases_ids_from_api,
@@ -54,6 +85,29 @@ class QaseConverter:
 
         return run_data, tests
 
+    def collect_cases_ids(
+        self,
+        items: list[pytest.Function],
+    ) -> set[int]:
+        """Collect ids of cases specified in tests markers."""
+        cases_ids = set()
+        for item in items:
+            _, case_id = self._resolve_case(item)
+            if case_id:
+                cases_ids.add(case_id)
+        return cases_ids
+
+    def map_tests_to_cases(
+        self,
+        items: list[pytest.Function],
+    ) -> tests_cases.TestsCases:
+        """Map pytest items to case ids without validation of cases."""
+        tests = tests_cases.TestsCases()
+        for item in items:
+            tests.add(item=item, case_id=self._resolve_case(item)[1])
+        self._clear_cache()
+        return tests
+
     def prepare_report_data(
         self,
         case_id: int,
@@ -61,7 +115,49 @@ class QaseConverter:
         item: pytest.Function,
         report: pytest.TestReport,
     ) -> ResultCreate:
-        """Create a test result based on results from pytest."""
+        """Create a test result based on results from pytest.
+
+        Stacktrace and comment exceeding size budget are truncated.
+
+        """
+        return self._fit_to_size_budget(
+            result=self._convert_report(
+                case_id=case_id,
+                run_id=run_id,
+                item=item,
+                report=report,
+            ),
+            folder=self._get_report_folder(run_id=run_id, test_name=item.name),
+        )
+
+    def aggregate_results(
+        self,
+        case_id: int,
+        run_id: int,
+        results: list[results_aggregator.TestResult],
+    ) -> ResultCreate:
+        """Combine results of parametrized tests sharing case.
+
+        Combined result gets the worst status and total duration of tests,
+        ids and comments of tests, which didn't pass, are listed in comment.
+
+        """
+        return self._fit_to_size_budget(
+            result=self._combine_results(case_id=case_id, results=results),
+            folder=self._get_report_folder(
+                run_id=run_id,
+                test_name=f"case-{case_id}",
+            ),
+        )
+
+    def _convert_report(
+        self,
+        case_id: int,
+        run_id: int,
+        item: pytest.Function,
+        report: pytest.TestReport,
+    ) -> ResultCreate:
+        """Convert pytest report to result depending on its outcome."""
         if hasattr(report, "wasxfail"):
             return self._prepare_xfailed_test_report(
                 case_id=case_id,
@@ -87,6 +183,53 @@ class QaseConverter:
                 )
         raise ValueError("Failed to convert test result!")
 
+    def _combine_results(
+        self,
+        case_id: int,
+        results: list[results_aggregator.TestResult],
+    ) -> ResultCreate:
+        """Combine results of tests of case into single result."""
+        if len(results) == 1:
+            return ResultCreate(
+                case_id=case_id,
+                status=results[0].status,
+                comment=results[0].comment,
+                time_ms=results[0].time_ms,
+                stacktrace=results[0].stacktrace,
+            )
+        tests_statuses: dict[str, str] = {}
+        for result in results:
+            tests_statuses[result.test_id] = min(
+                tests_statuses.get(result.test_id, result.status),
+                result.status,
+                key=constants.RESULTS_STATUSES.index,
+            )
+        comment_lines = [
+            constants.AGGREGATED_TESTS.format(
+                passed=list(tests_statuses.values()).count("passed"),
+                total=len(tests_statuses),
+            ),
+        ]
+        stacktraces = []
+        for result in results:
+            if result.status == "passed":
+                continue
+            comment_lines.append(
+                f"\n`{result.test_id}` ({result.status}): {result.comment}",
+            )
+            if result.stacktrace:
+                stacktraces.append(f"{result.test_id}:\n{result.stacktrace}")
+        return ResultCreate(
+            case_id=case_id,
+            status=min(
+                tests_statuses.values(),
+                key=constants.RESULTS_STATUSES.index,
+            ),
+            comment="\n".join(comment_lines),
+            time_ms=sum(result.time_ms or 0 for result in results),
+            stacktrace="\n\n".join(stacktraces) or None,
+        )
+
     def _prepare_passed_test_report(
         self,
         case_id: int,
@@ -145,17 +288,20 @@ class QaseConverter:
     ) -> ResultCreate:
         """Prepare result report for failed test."""
         comment = constants.TEST_FAILED.format(when=report.when)
+        started_at = time.perf_counter()
         debug_information = self._config.hook.pytest_get_debug_info(item=item)
-        if debug_information and self._file_storage:
-            folder = constants.REPORT_FOLDER_TEMPLATE.format(
-                env=self._env,
-                id=run_id,
-                browser=self._browser,
-                test_name=item.name,
+        if debug_information:
+            self._record_capture_time(
+                item=item,
+                duration=time.perf_counter() - started_at,
             )
+        if debug_information and self._file_storage:
             debug_comment = debug_information.generate_debug_comment(
                 file_storage=self._file_storage,
-                folder=folder,
+                folder=self._get_report_folder(
+                    run_id=run_id,
+                    test_name=item.name,
+                ),
             )
             comment += f"\n{debug_comment}"
 
@@ -167,11 +313,113 @@ class QaseConverter:
             stacktrace=report.longreprtext,
         )
 
+    def _record_capture_time(
+        self,
+        item: pytest.Function,
+        duration: float,
+    ) -> None:
+        """Record time of capturing debug info of failed test.
+
+        Time is saved to user properties of test (so it's available in
+        reports, f.e. JUnit XML) and to metrics shown in terminal summary.
+
+        """
+        item.user_properties.append(
+            ("qase_debug_info_capture_time", round(duration, 3)),
+        )
+        if self._metrics:
+            self._metrics.record(
+                operation="capture_debug_info",
+                duration=duration,
+            )
+
+    def _get_report_folder(self, run_id: int, test_name: str) -> str:
+        """Get folder in file storage for files of test result."""
+        return constants.REPORT_FOLDER_TEMPLATE.format(
+            env=self._env,
+            id=run_id,
+            browser=self._browser,
+            test_name=test_name,
+        )
+
+    def _fit_to_size_budget(
+        self,
+        result: ResultCreate,
+        folder: str,
+    ) -> ResultCreate:
+        """Truncate stacktrace and comment exceeding size budget.
+
+        Huge stacktraces (f.e. with `--tb=long` and big assertion diffs) slow
+        down sending of results, so full texts are uploaded to file storage
+        once and linked from comment instead.
+
+        """
+        links: list[str] = []
+        texts_budgets = (
+            (
+                "stacktrace",
+                self._config.getoption("--qase-max-stacktrace-size"),
+            ),
+            ("comment", self._config.getoption("--qase-max-comment-size")),
+        )
+        for name, max_size in texts_budgets:
+            text: str | None = getattr(result, name)
+            if not text or not max_size:
+                continue
+            text_size = len(text.encode())
+            if text_size + self._get_links_size(name, links) <= max_size:
+                continue
+            if url := self._upload_full_text(
+                text=text,
+                filename=f"{folder}/{name}.txt",
+            ):
+                links.append(
+                    constants.FULL_TEXT_LINK.format(
+                        name=name,
+                        filename=f"{name}.txt",
+                        url=url,
+                    ),
+                )
+            setattr(
+                result,
+                name,
+                truncation.truncate_text(
+                    text=text,
+                    max_size=max(
+                        max_size - self._get_links_size(name, links),
+                        0,
+                    ),
+                ),
+            )
+        if links:
+            result.comment = "\n".join(filter(None, [result.comment, *links]))
+        return result
+
+    @staticmethod
+    def _get_links_size(name: str, links: list[str]) -> int:
+        """Get size of links to full texts, which are added to comment."""
+        if name != "comment" or not links:
+            return 0
+        return sum(len(link.encode()) + 1 for link in links)
+
+    def _upload_full_text(self, text: str, filename: str) -> str:
+        """Upload full text to file storage and return its URL."""
+        if not self._file_storage:
+            return ""
+        try:
+            return self._file_storage.save_file_obj(
+                content=text.encode(),
+                filename=filename,
+            )
+        except Exception:
+            self._logger.exception(f"Can't save {filename} to storage")
+            return ""
+
     def _prepare_cases_for_run(
         self,
-        cases_ids_from_api: list[int],
+        cases_ids_from_api: cases_index.CasesIndex,
         items: list[pytest.Function],
-    ) -> tuple[list[int], dict[str, int | None]]:
+    ) -> tuple[list[int], tests_cases.TestsCases]:
         """Collect test cases from test markers.
 
         Raise InvalidCaseId in case if incorrect case id was provided.
@@ -181,22 +429,17 @@ class QaseConverter:
         cases_ids = []
 
         case_id_invalid = False
-        # list of parsed markers to track duplicating case IDs
+        # set of parsed markers to track duplicating case IDs
         # in different tests
-        parsed_markers_ids = []
-        # Mapping of pytest items ids and case id
-        tests: dict[str, int | None] = {}
+        parsed_markers_ids: set[int] = set()
+        tests = tests_cases.TestsCases()
         for item in items:
-            case_id = self._extract_case_id_from_test(
-                project_code=self._project_code,
-                item=item,
-            )
-            tests[item.nodeid] = case_id
-            qase_marker = self._extract_qase_marker(item)
+            qase_marker, case_id = self._resolve_case(item)
+            tests.add(item=item, case_id=case_id)
             qase_marker_id = id(qase_marker)
             if qase_marker_id in parsed_markers_ids:
                 continue
-            parsed_markers_ids.append(qase_marker_id)
+            parsed_markers_ids.add(qase_marker_id)
 
             if not case_id:
                 self._logger.error(
@@ -224,6 +467,7 @@ class QaseConverter:
 
         if case_id_invalid:
             raise plugin_exceptions.InvalidCaseId()
+        self._clear_cache()
         return cases_ids, tests
 
     def _extract_qase_marker(
@@ -247,25 +491,39 @@ class QaseConverter:
 
     def _extract_case_id_from_marker(
         self,
-        project_code: str,
         marker: pytest.Mark,
     ) -> int | None:
         """Shortcut to extract qase case ID from marker."""
         if len(marker.args) != 1:
             return None
         url = marker.args[0]
-        return int(url.split(f"{project_code}-")[-1])
+        match = self._case_url_pattern.search(url)
+        return int(match["case_id"] if match else url)
 
-    def _extract_case_id_from_test(
+    def _resolve_case(
         self,
-        project_code: str,
         item: pytest.Function,
-    ) -> int | None:
-        """Get test case's id marker from test item."""
+    ) -> tuple[pytest.Mark | None, int | None]:
+        """Get qase marker and case id of test item.
+
+        Result is cached per item, and case id is cached per marker, so
+        huge parametrized tests don't parse same URL for each item.
+
+        """
+        if item.nodeid in self._items_cases:
+            return self._items_cases[item.nodeid]
         marker = self._extract_qase_marker(item=item)
-        if not marker:
-            return None
-        return self._extract_case_id_from_marker(
-            project_code=project_code,
-            marker=marker,
-        )
+        case_id: int | None = None
+        if marker:
+            if id(marker) not in self._markers_cases:
+                self._markers_cases[id(marker)] = (
+                    self._extract_case_id_from_marker(marker=marker)
+                )
+            case_id = self._markers_cases[id(marker)]
+        self._items_cases[item.nodeid] = (marker, case_id)
+        return marker, case_id
+
+    def _clear_cache(self) -> None:
+        """Clear cache of resolved cases, once tests are mapped to cases."""
+        self._items_cases.clear()
+        self._markers_cases.clear()
@@ -1,6 +1,12 @@
 import base64
 import collections.abc
+import concurrent.futures
+import functools
 import logging
+import pathlib
+import tempfile
+import threading
+import time
 import typing
 
 import arrow
@@ -11,6 +17,13 @@ if typing.TYPE_CHECKING:
     from selenium.webdriver.remote.webdriver import WebDriver
 
 
+# Number of characters of screenshot and HTML converted to bytes at once,
+# it's multiple of 4, so base64 encoded screenshot is decoded by whole blocks
+CHUNK_SIZE = 1024 * 1024
+
+ResultT = typing.TypeVar("ResultT")
+
+
 class DebugInfo(typing.Protocol):
     """Protocol for representing required debug info objects interfaces."""
 
@@ -24,21 +37,165 @@ class DebugInfo(typing.Protocol):
 
 
 class SeleniumDebugInfo:
-    """Representation of selenium debug information."""
+    """Representation of selenium debug information.
+
+    Data is extracted from webdriver concurrently with timeout, so hanging
+    browser doesn't stall failed test. Screenshot, HTML and browser log are
+    written to temporary files in `tmp_dir` (system temporary directory by
+    default) right after they are extracted and uploaded from them, so debug
+    files of failed tests aren't kept in memory until upload. Temporary files
+    are removed once they are uploaded or object is garbage collected.
+
+    """
+
+    def __init__(
+        self,
+        webdriver: "WebDriver",
+        upload_timeout: float = 60,
+        tmp_dir: pathlib.Path | None = None,
+        capture_timeout: float = 30,
+    ) -> None:
+        """Set error log and extract data from webdriver.
+
+        Data is extracted concurrently, since each extraction is separate
+        request to (possibly remote) webdriver. Data which isn't extracted
+        in `capture_timeout` seconds is skipped.
 
-    def __init__(self, webdriver: "WebDriver") -> None:
-        """Set error log and extract data from webdriver."""
+        """
         self.webdriver = webdriver
+        self.upload_timeout = upload_timeout
+        self.tmp_dir = tmp_dir
+        self.capture_timeout = capture_timeout
         self.logger = logging.getLogger(__name__)
-        self.screenshot = self._extract_screenshot()
-        self.html = self._extract_html()
-        self.browser_log = self._extract_browser_log()
-        self.url = self._extract_url()
+        if self.tmp_dir:
+            self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+        screenshot = self._submit(
+            name="capture-screenshot",
+            function=self._extract_screenshot,
+        )
+        html = self._submit(name="capture-html", function=self._extract_html)
+        # Browser log isn't uploaded if it isn't extracted in time
+        browser_log: concurrent.futures.Future[typing.BinaryIO | None]
+        browser_log = self._submit(
+            name="capture-browser-log",
+            function=self._extract_browser_log,
+        )
+        url = self._submit(name="capture-url", function=self._extract_url)
+        deadline = time.monotonic() + self.capture_timeout
+        self.screenshot = self._get_captured(
+            name="screenshot",
+            future=screenshot,
+            deadline=deadline,
+            default=None,
+        )
+        self.html = self._get_captured(
+            name="html",
+            future=html,
+            deadline=deadline,
+            default=None,
+        )
+        self.browser_log = self._get_captured(
+            name="browser_log",
+            future=browser_log,
+            deadline=deadline,
+            default=None,
+        )
+        self.url = self._get_captured(
+            name="url",
+            future=url,
+            deadline=deadline,
+            default="",
+        )
+
+    @classmethod
+    def _submit(
+        cls,
+        name: str,
+        function: collections.abc.Callable[[], ResultT],
+    ) -> concurrent.futures.Future[ResultT]:
+        """Call function in daemon thread and return future of its result.
+
+        Daemon thread is used, so webdriver or storage call, which hangs
+        after timeout, doesn't block exit of pytest (threads of
+        `ThreadPoolExecutor` are joined on exit).
+
+        """
+        future: concurrent.futures.Future[ResultT] = (
+            concurrent.futures.Future()
+        )
+        threading.Thread(
+            target=cls._call,
+            kwargs={"future": future, "function": function},
+            name=f"qase-debug-info-{name}",
+            daemon=True,
+        ).start()
+        return future
+
+    @staticmethod
+    def _call(
+        future: concurrent.futures.Future[ResultT],
+        function: collections.abc.Callable[[], ResultT],
+    ) -> None:
+        """Call function and set its result as result of future."""
+        try:
+            future.set_result(function())
+        except Exception as error:  # noqa: BLE001
+            future.set_exception(error)
+
+    def _get_captured(
+        self,
+        name: str,
+        future: concurrent.futures.Future[ResultT],
+        deadline: float,
+        default: ResultT,
+    ) -> ResultT:
+        """Wait for extracted data, return default if it isn't extracted."""
+        try:
+            return future.result(
+                timeout=max(deadline - time.monotonic(), 0),
+            )
+        except TimeoutError:
+            self.logger.error(  # noqa: TRY400
+                msg=(
+                    f"Can't extract {name} from webdriver in "
+                    f"{self.capture_timeout} seconds"
+                ),
+            )
+        except Exception:
+            self.logger.exception(msg=f"Can't extract {name} from webdriver")
+        return default
 
-    def _extract_screenshot(self) -> bytes | None:
+    def _create_tmp_file(self) -> typing.BinaryIO:
+        """Create temporary file, which is removed once it's closed."""
+        return typing.cast(
+            typing.BinaryIO,
+            tempfile.TemporaryFile(dir=self.tmp_dir, prefix="qase-"),
+        )
+
+    def _write_tmp_file(
+        self,
+        chunks: collections.abc.Iterable[bytes],
+    ) -> typing.BinaryIO:
+        """Write chunks of content to temporary file and rewind it."""
+        file = self._create_tmp_file()
+        try:
+            for chunk in chunks:
+                file.write(chunk)
+        except BaseException:
+            file.close()
+            raise
+        file.seek(0)
+        return file
+
+    def _extract_screenshot(self) -> typing.BinaryIO | None:
         try:
-            return base64.b64decode(
-                self.webdriver.get_screenshot_as_base64().encode("utf-8"),
+            screenshot = self.webdriver.get_screenshot_as_base64()
+            # Screenshot is decoded by chunks to avoid keeping second copy
+            # of it in memory
+            return self._write_tmp_file(
+                base64.b64decode(screenshot[start : start + CHUNK_SIZE])
+                for start in range(0, len(screenshot), CHUNK_SIZE)
             )
         except Exception:
             self.logger.exception(
@@ -46,9 +203,13 @@ class SeleniumDebugInfo:
             )
             return None
 
-    def _extract_html(self) -> bytes | None:
+    def _extract_html(self) -> typing.BinaryIO | None:
         try:
-            return self.webdriver.page_source.encode("utf-8")
+            html = self.webdriver.page_source
+            return self._write_tmp_file(
+                html[start : start + CHUNK_SIZE].encode("utf-8")
+                for start in range(0, len(html), CHUNK_SIZE)
+            )
         except Exception:
             self.logger.exception(
                 msg="Can't extract html page source from webdriver",
@@ -64,12 +225,18 @@ class SeleniumDebugInfo:
             )
             return ""
 
-    def _extract_browser_log(self) -> str:
+    def _extract_browser_log(self) -> typing.BinaryIO:
+        file = self._create_tmp_file()
         try:
-            logs = [
-                self._format_log(self.webdriver.get_log(name))  # type: ignore
-                for name in self.webdriver.log_types  # type: ignore
-            ]
+            for index, name in enumerate(
+                self.webdriver.log_types,  # type: ignore
+            ):
+                log = self._format_log(
+                    self.webdriver.get_log(name),  # type: ignore
+                )
+                if index:
+                    file.write(b"\n")
+                file.write(log.encode("utf-8"))
         except Exception:
             # Sometimes there can be problems reading some logs from the
             # browser here (such as `ProtocolError('Connection broken')`).
@@ -80,8 +247,10 @@ class SeleniumDebugInfo:
             # the following issue
             # https://github.com/mozilla/geckodriver/issues/284
             self.logger.exception(msg="Can't extract browser log")
-            logs = []
-        return "\n".join(logs)
+            file.seek(0)
+            file.truncate()
+        file.seek(0)
+        return file
 
     @staticmethod
     def _format_log(
@@ -109,44 +278,134 @@ class SeleniumDebugInfo:
         folder: str,
     ) -> str:
         """Generate debug comment with links to debug info files."""
-        screenshot_url = ""
-        if self.screenshot:
-            try:
-                screenshot_url = file_storage.save_file_obj(
-                    content=self.screenshot,
-                    filename=f"{folder}/screenshot.png",
-                )
-            except Exception:
-                self.logger.exception(
-                    msg="Can't save screenshot to storage",
+        # Mapping of url names in comment template and files to upload,
+        # empty screenshot and HTML aren't uploaded
+        uploads: dict[str, tuple[str, typing.BinaryIO | None, str]] = {
+            "screenshot_url": (
+                "screenshot",
+                self._get_non_empty_file(self.screenshot),
+                f"{folder}/screenshot.png",
+            ),
+            "html_url": (
+                "HTML",
+                self._get_non_empty_file(self.html),
+                f"{folder}/html.html",
+            ),
+            "browser_log_url": (
+                "browser log",
+                self.browser_log,
+                f"{folder}/browser_log.txt",
+            ),
+        }
+        files = {
+            filename: file
+            for _, file, filename in uploads.values()
+            if file is not None
+        }
+        # Files are uploaded in background threads, so failed test waits for
+        # uploads no longer than upload timeout
+        futures: dict[str, concurrent.futures.Future[dict[str, str]]]
+        if isinstance(file_storage, storage.BatchFileStorage):
+            # Upload all files with single request, storage requires content
+            # of files, so they are read to memory only for upload
+            batch_future = self._submit(
+                name="upload",
+                function=functools.partial(
+                    self._save_files,
+                    file_storage=file_storage,
+                    files=files,
+                ),
+            )
+            futures = dict.fromkeys(files, batch_future)
+        else:
+            # Upload files concurrently, so failed test waits only for the
+            # slowest upload instead of all of them
+            futures = {
+                filename: self._submit(
+                    name="upload",
+                    function=functools.partial(
+                        self._save_file,
+                        file_storage=file_storage,
+                        file=file,
+                        filename=filename,
+                    ),
                 )
+                for filename, file in files.items()
+            }
+        # Temporary files are removed once their uploads are done, even if
+        # test doesn't wait for them
+        for filename, future in futures.items():
+            future.add_done_callback(
+                functools.partial(self._close_file, files[filename]),
+            )
 
-        html_url = ""
-        if self.html:
+        urls = dict.fromkeys(uploads, "")
+        deadline = time.monotonic() + self.upload_timeout
+        for url_name, (file_title, _, filename) in uploads.items():
+            if filename not in futures:
+                continue
             try:
-                html_url = file_storage.save_file_obj(
-                    content=self.html,
-                    filename=f"{folder}/html.html",
+                saved_files = futures[filename].result(
+                    timeout=max(deadline - time.monotonic(), 0),
+                )
+            except TimeoutError:
+                self.logger.error(  # noqa: TRY400
+                    msg=(
+                        f"Can't save {file_title} to storage in "
+                        f"{self.upload_timeout} seconds"
+                    ),
                 )
             except Exception:
                 self.logger.exception(
-                    msg="Can't save HTML to storage",
+                    msg=f"Can't save {file_title} to storage",
                 )
-
-        try:
-            browser_log_url = file_storage.save_file_obj(
-                content=self.browser_log.encode("utf-8"),
-                filename=f"{folder}/browser_log.txt",
-            )
-        except Exception:
-            self.logger.exception(
-                msg="Can't save browser log to storage",
-            )
-            browser_log_url = ""
+            else:
+                urls[url_name] = saved_files.get(filename, "")
 
         return constants.FAILED_TEST_REPORT_TEMPLATE.format(
             url=self.url,
-            screenshot_url=screenshot_url,
-            html_url=html_url,
-            browser_log_url=browser_log_url,
+            **urls,
+        )
+
+    @staticmethod
+    def _close_file(
+        file: typing.BinaryIO,
+        _: concurrent.futures.Future[dict[str, str]],
+    ) -> None:
+        """Close uploaded temporary file, so it's removed."""
+        file.close()
+
+    @staticmethod
+    def _get_non_empty_file(
+        file: typing.BinaryIO | None,
+    ) -> typing.BinaryIO | None:
+        """Return file if it isn't empty, close it otherwise."""
+        if file is None or storage.get_file_size(file):
+            return file
+        file.close()
+        return None
+
+    @staticmethod
+    def _save_file(
+        file_storage: storage.FileStorage,
+        file: typing.BinaryIO,
+        filename: str,
+    ) -> dict[str, str]:
+        """Upload single file and return mapping of its name and URL."""
+        return {
+            filename: storage.save_file_stream(
+                file_storage=file_storage,
+                file=file,
+                filename=filename,
+            ),
+        }
+
+    @staticmethod
+    def _save_files(
+        file_storage: storage.BatchFileStorage,
+        files: collections.abc.Mapping[str, typing.BinaryIO],
+    ) -> dict[str, str]:
+        """Read files and upload them with single request."""
+        return file_storage.save_files(
+            files={filename: file.read() for filename, file in files.items()},
         )
@@ -0,0 +1,86 @@
+import hashlib
+import pathlib
+import tempfile
+import threading
+import typing
+
+# Number of bytes of file read at once to get its key
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadedFilesCache:
+    """Cache of URLs of uploaded files addressed by files content.
+
+    Allows to skip uploading of identical files, f.e. same screenshots of
+    login page for tests failed because of broken authorization. If
+    `cache_dir` is provided, cache is also stored on disk, so it can be
+    shared between several processes (f.e. xdist workers).
+
+    """
+
+    def __init__(
+        self,
+        cache_dir: pathlib.Path | None = None,
+    ) -> None:
+        """Init cache."""
+        self._cache_dir = cache_dir
+        self._urls: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def get_key(content: bytes, filename: str) -> str:
+        """Return cache key of file.
+
+        File extension is a part of key, since storages can rely on it (f.e.
+        for content type).
+
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        return f"{digest}{pathlib.PurePosixPath(filename).suffix}"
+
+    @staticmethod
+    def get_file_key(file: typing.BinaryIO, filename: str) -> str:
+        """Return cache key of file object, reading it by chunks."""
+        digest = hashlib.sha256()
+        while chunk := file.read(CHUNK_SIZE):
+            digest.update(chunk)
+        return f"{digest.hexdigest()}{pathlib.PurePosixPath(filename).suffix}"
+
+    def get(self, key: str) -> str | None:
+        """Return URL of uploaded file and count cache hit or miss."""
+        url = self._urls.get(key)
+        if url is None and self._cache_dir:
+            try:
+                url = (self._cache_dir / key).read_text()
+            except OSError:
+                url = None
+        with self._lock:
+            if url is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._urls[key] = url
+        return url
+
+    def merge(self, hits: int, misses: int) -> None:
+        """Add cache hits and misses counted by other process."""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def set(self, key: str, url: str) -> None:
+        """Save URL of uploaded file."""
+        self._urls[key] = url
+        if not self._cache_dir:
+            return
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="w",
+            dir=self._cache_dir,
+            prefix=f"{key}.",
+            delete=False,
+        ) as cache_file:
+            cache_file.write(url)
+        pathlib.Path(cache_file.name).replace(self._cache_dir / key)
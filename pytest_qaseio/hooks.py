@@ -1,12 +1,16 @@
-import pytest
+import typing
 
-from pytest_qaseio.debug_info import DebugInfo
+import pytest
 
-from . import storage
+if typing.TYPE_CHECKING:
+    from . import storage
+    from .debug_info import DebugInfo
 
 
 @pytest.hookspec(firstresult=True)
-def pytest_qase_file_storages() -> dict[str, storage.FileStorage]:  # type: ignore
+def pytest_qase_file_storages(  # type: ignore
+    config: pytest.Config,
+) -> "dict[str, storage.FileStorage]":
     """Return mapping options to file storage instance.
 
     Example:
@@ -23,7 +27,7 @@ def pytest_qase_browser_name(config: pytest.Config) -> str:  # type: ignore
 
 
 @pytest.hookspec(firstresult=True)
-def pytest_get_debug_info(item: pytest.Function) -> DebugInfo | None:
+def pytest_get_debug_info(item: pytest.Function) -> "DebugInfo | None":
     """Return object with test debug information."""
 
 
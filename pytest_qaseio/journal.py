@@ -0,0 +1,146 @@
+import collections
+import collections.abc
+import json
+import os
+import pathlib
+import threading
+import typing
+import uuid
+
+from qase.api_client_v1.models.result_create import ResultCreate
+
+
+class ResultsJournal:
+    """Write-ahead journal of tests results sent to Qase.
+
+    Each result is written to journal before sending and acknowledged once
+    Qase confirms it, so results which weren't sent because of crash of
+    process can be sent later. Each process writes its own journal file.
+
+    Journal file is json lines file with entries of two kinds:
+
+    * `{"id": 1, "run_id": 2, "result": {...}}` - result to send
+    * `{"ack": [1, 2, 3]}` - ids of results confirmed by Qase
+
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        """Prepare journal file."""
+        self.path = path
+        self._file: typing.TextIO | None = None
+        self._lock = threading.Lock()
+        # Ids of journal entries which are not confirmed yet
+        self._pending: set[int] = set()
+        self._last_entry_id = 0
+
+    @classmethod
+    def for_process(cls, journal_dir: pathlib.Path) -> "ResultsJournal":
+        """Create journal for current process.
+
+        Name of journal is unique for each session, so process which reuses
+        pid of crashed one doesn't append to its journal and doesn't remove
+        its pending results.
+
+        """
+        return cls(
+            path=journal_dir
+            / f"journal-{os.getpid()}-{uuid.uuid4().hex}.jsonl",
+        )
+
+    @property
+    def pending(self) -> int:
+        """Return number of results which are not confirmed yet."""
+        return len(self._pending)
+
+    def append(self, run_id: int, result: ResultCreate) -> int:
+        """Write result to journal and return id of its entry.
+
+        Entries are passed to OS right away, so they survive crash of
+        process, but they are synced to disk only by `sync`, which is called
+        once per batch of sent results.
+
+        """
+        with self._lock:
+            self._last_entry_id += 1
+            self._pending.add(self._last_entry_id)
+            self._write(
+                {
+                    "id": self._last_entry_id,
+                    "run_id": run_id,
+                    "result": result.to_dict(),
+                },
+            )
+            return self._last_entry_id
+
+    def sync(self) -> None:
+        """Make sure that written entries are stored on disk."""
+        with self._lock:
+            if not self._file:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def acknowledge(self, entries_ids: collections.abc.Iterable[int]) -> None:
+        """Mark results of entries as confirmed by Qase."""
+        with self._lock:
+            confirmed_ids = [
+                entry_id
+                for entry_id in entries_ids
+                if entry_id in self._pending
+            ]
+            if confirmed_ids:
+                self._pending.difference_update(confirmed_ids)
+                self._write({"ack": confirmed_ids})
+
+    def close(self) -> None:
+        """Close journal and remove it if all results were confirmed."""
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+            if not self._pending:
+                self.path.unlink(missing_ok=True)
+
+    def load_pending(self) -> dict[int, dict[int, ResultCreate]]:
+        """Load not confirmed results grouped by run id.
+
+        Results of each run are mapped by ids of their entries, so they can
+        be acknowledged in the same way as appended ones.
+
+        """
+        entries: dict[int, tuple[int, ResultCreate]] = {}
+        with self.path.open() as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # Last line could be written partially because of crash
+                    continue
+                if "ack" in entry:
+                    for entry_id in entry["ack"]:
+                        entries.pop(entry_id, None)
+                    continue
+                entries[entry["id"]] = (
+                    entry["run_id"],
+                    typing.cast(
+                        ResultCreate,
+                        ResultCreate.from_dict(entry["result"]),
+                    ),
+                )
+                self._last_entry_id = max(self._last_entry_id, entry["id"])
+
+        pending: dict[int, dict[int, ResultCreate]] = collections.defaultdict(
+            dict,
+        )
+        for entry_id, (run_id, result) in entries.items():
+            self._pending.add(entry_id)
+            pending[run_id][entry_id] = result
+        return pending
+
+    def _write(self, entry: dict[str, typing.Any]) -> None:
+        """Write entry to journal file."""
+        if not self._file:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self.path.open(mode="a")
+        self._file.write(f"{json.dumps(entry)}\n")
+        self._file.flush()
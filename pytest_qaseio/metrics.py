@@ -0,0 +1,164 @@
+import collections
+import json
+import pathlib
+import threading
+import typing
+
+from qase.api_client_v1.exceptions import ApiException
+
+# Upper bounds (in seconds) of buckets of latency histogram, last bucket
+# contains all slower calls
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _new_operation_stats() -> dict[str, typing.Any]:
+    """Return empty statistics of operation."""
+    return {
+        "calls": 0,
+        "retries": 0,
+        "bytes_sent": 0,
+        "errors": {},
+        "latency_total": 0.0,
+        "latency_max": 0.0,
+        "latency_buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+    }
+
+
+class ApiMetrics:
+    """Statistics of calls to Qase API and file storages.
+
+    Statistics are collected per operation (name of called API method or
+    storage method) and can be merged with statistics of other processes
+    (f.e. xdist workers).
+
+    """
+
+    def __init__(self) -> None:
+        """Init empty statistics."""
+        self._operations: dict[str, dict[str, typing.Any]] = (
+            collections.defaultdict(_new_operation_stats)
+        )
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        operation: str,
+        duration: float,
+        bytes_sent: int = 0,
+        error: BaseException | None = None,
+    ) -> None:
+        """Record single call of operation."""
+        bucket = next(
+            (
+                index
+                for index, bound in enumerate(LATENCY_BUCKETS)
+                if duration <= bound
+            ),
+            len(LATENCY_BUCKETS),
+        )
+        with self._lock:
+            stats = self._operations[operation]
+            stats["calls"] += 1
+            stats["bytes_sent"] += bytes_sent
+            stats["latency_total"] += duration
+            stats["latency_max"] = max(stats["latency_max"], duration)
+            stats["latency_buckets"][bucket] += 1
+            if error is not None:
+                error_class = self.get_error_class(error)
+                stats["errors"][error_class] = (
+                    stats["errors"].get(error_class, 0) + 1
+                )
+
+    def record_retry(self, operation: str) -> None:
+        """Record retry of operation call."""
+        with self._lock:
+            self._operations[operation]["retries"] += 1
+
+    @staticmethod
+    def get_error_class(error: BaseException) -> str:
+        """Return name of error class, including HTTP status for API."""
+        if isinstance(error, ApiException):
+            return f"{type(error).__name__}({error.status})"
+        return type(error).__name__
+
+    def to_dict(self) -> dict[str, dict[str, typing.Any]]:
+        """Return statistics as json serializable dict."""
+        with self._lock:
+            return json.loads(json.dumps(self._operations))
+
+    def merge(self, operations: dict[str, dict[str, typing.Any]]) -> None:
+        """Add statistics of other process."""
+        with self._lock:
+            for operation, other_stats in operations.items():
+                stats = self._operations[operation]
+                for key in ("calls", "retries", "bytes_sent", "latency_total"):
+                    stats[key] += other_stats[key]
+                stats["latency_max"] = max(
+                    stats["latency_max"],
+                    other_stats["latency_max"],
+                )
+                stats["latency_buckets"] = [
+                    count + other_count
+                    for count, other_count in zip(
+                        stats["latency_buckets"],
+                        other_stats["latency_buckets"],
+                        strict=True,
+                    )
+                ]
+                for error_class, count in other_stats["errors"].items():
+                    stats["errors"][error_class] = (
+                        stats["errors"].get(error_class, 0) + count
+                    )
+
+    def save(self, path: pathlib.Path) -> None:
+        """Write statistics to json file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            json.dumps(
+                {
+                    "latency_buckets": [*LATENCY_BUCKETS, None],
+                    "operations": self.to_dict(),
+                },
+                indent=2,
+            ),
+        )
+
+    def format_summary(self) -> list[str]:
+        """Return lines of statistics for terminal summary."""
+        lines = []
+        for operation, stats in sorted(self.to_dict().items()):
+            average = stats["latency_total"] / max(stats["calls"], 1)
+            line = (
+                f"{operation}: {stats['calls']} calls, "
+                f"{stats['retries']} retries, "
+                f"avg {average:.3f}s, "
+                f"p95 <= {self._get_percentile_bound(stats, 0.95)}, "
+                f"max {stats['latency_max']:.3f}s, "
+                f"{stats['bytes_sent']} bytes sent"
+            )
+            if stats["errors"]:
+                errors = ", ".join(
+                    f"{error_class}: {count}"
+                    for error_class, count in sorted(stats["errors"].items())
+                )
+                line = f"{line}, errors: {errors}"
+            lines.append(line)
+        return lines
+
+    @staticmethod
+    def _get_percentile_bound(
+        stats: dict[str, typing.Any],
+        percentile: float,
+    ) -> str:
+        """Return upper bound of histogram bucket containing percentile."""
+        threshold = stats["calls"] * percentile
+        calls = 0
+        for bound, count in zip(
+            LATENCY_BUCKETS,
+            stats["latency_buckets"],
+            strict=False,
+        ):
+            calls += count
+            if calls >= threshold:
+                return f"{bound}s"
+        return f"{stats['latency_max']:.3f}s"
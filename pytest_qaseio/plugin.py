@@ -1,18 +1,27 @@
+import argparse
 import datetime
 import logging
 import os
 import pathlib
 import typing
 
-import filelock
 import pytest
-from qase.api_client_v1.exceptions import ApiException
-from qase.api_client_v1.models.result_create import ResultCreate
-from qase.api_client_v1.models.run import Run
 
-from pytest_qaseio.debug_info import DebugInfo, SeleniumDebugInfo
+from . import constants
 
-from . import api_client, constants, converter, plugin_exceptions, storage
+# Plugin is loaded by pytest on every run, so heavy dependencies (Qase API
+# client, etc.) are imported only once reporting to Qase is enabled
+if typing.TYPE_CHECKING:
+    from . import qase_plugin, storage
+    from .debug_info import DebugInfo
+
+
+def _positive_float(value: str) -> float:
+    """Parse option value, which must be positive number."""
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"{value} is not positive number")
+    return number
 
 
 def pytest_addoption(parser: pytest.Parser) -> None:
@@ -26,7 +35,41 @@ def pytest_addoption(parser: pytest.Parser) -> None:
     parser.addoption(
         "--qase-file-storage",
         default="qase",
-        help="Choose file storage to upload debug files",
+        help=(
+            "Choose file storage to upload debug files, `qase`, `local` and "
+            "`s3` are available by default"
+        ),
+    )
+    parser.addoption(
+        "--qase-local-storage-dir",
+        default=".pytest-qaseio-files",
+        help="Specify directory to save debug files to by `local` storage",
+    )
+    parser.addoption(
+        "--qase-local-storage-url",
+        default="",
+        help=(
+            "Specify URL of directory of `local` storage (f.e. if it's "
+            "served by web server), `file://` URLs are used by default"
+        ),
+    )
+    parser.addoption(
+        "--qase-s3-multipart-chunk-size",
+        type=int,
+        default=8 * 1024 * 1024,
+        help=(
+            "Specify size of parts in bytes for multipart upload of files to "
+            "`s3` storage, smaller files are uploaded with single request"
+        ),
+    )
+    parser.addoption(
+        "--qase-s3-max-concurrency",
+        type=int,
+        default=4,
+        help=(
+            "Specify max number of parts of file uploaded to `s3` storage "
+            "in parallel"
+        ),
     )
     parser.addoption(
         "--qase-run-name",
@@ -38,6 +81,220 @@ def pytest_addoption(parser: pytest.Parser) -> None:
         default=3,
         help="Specify number of retries for Qase API requests",
     )
+    parser.addoption(
+        "--qase-upload-timeout",
+        type=float,
+        default=60,
+        help=(
+            "Specify max number of seconds to wait for upload of debug files "
+            "of failed test"
+        ),
+    )
+    parser.addoption(
+        "--qase-capture-timeout",
+        type=float,
+        default=30,
+        help=(
+            "Specify max number of seconds to wait for screenshot, HTML, "
+            "browser log and URL of failed test from webdriver"
+        ),
+    )
+    parser.addoption(
+        "--qase-artifacts-tmp-dir",
+        default=None,
+        help=(
+            "Specify directory for temporary files of debug info of failed "
+            "tests, which are kept there until upload instead of memory. "
+            "System temporary directory is used by default"
+        ),
+    )
+    parser.addoption(
+        "--qase-screenshot-format",
+        choices=("png", "webp", "jpeg"),
+        default="png",
+        help=(
+            "Choose format to transcode screenshots to before upload, "
+            "`webp` and `jpeg` require `pytest-qaseio[images]`"
+        ),
+    )
+    parser.addoption(
+        "--qase-screenshot-quality",
+        type=int,
+        default=80,
+        help="Specify quality of transcoded `webp` and `jpeg` screenshots",
+    )
+    parser.addoption(
+        "--qase-screenshot-max-size",
+        type=int,
+        default=0,
+        help=(
+            "Specify max width and height of screenshots in pixels, larger "
+            "screenshots are downscaled keeping aspect ratio. Use 0 to keep "
+            "original size"
+        ),
+    )
+    parser.addoption(
+        "--qase-compress-text-files",
+        action="store_true",
+        default=False,
+        help="Compress HTML and logs of failed tests with gzip before upload",
+    )
+    parser.addoption(
+        "--qase-deduplicate-files",
+        choices=("none", "memory", "disk"),
+        default="none",
+        help=(
+            "Skip uploading of debug files identical to already uploaded "
+            "ones: `memory` shares uploaded files within process, `disk` "
+            "shares them between processes via pytest cache"
+        ),
+    )
+    parser.addoption(
+        "--qase-connection-pool-size",
+        type=int,
+        default=None,
+        help=(
+            "Specify max number of connections to Qase API kept alive "
+            "for reuse"
+        ),
+    )
+    parser.addoption(
+        "--qase-cases-validation",
+        choices=("project", "tests"),
+        default="project",
+        help=(
+            "Choose how to validate cases ids from tests: `project` loads all "
+            "cases of project, `tests` loads only cases specified in tests"
+        ),
+    )
+    parser.addoption(
+        "--qase-cases-cache-ttl",
+        type=float,
+        default=3600,
+        help=(
+            "Specify number of seconds to keep project cases ids in pytest "
+            "cache, use 0 to disable cache"
+        ),
+    )
+    parser.addoption(
+        "--qase-refresh-cases-cache",
+        action="store_true",
+        default=False,
+        help="Load project cases ids from Qase ignoring cache",
+    )
+    parser.addoption(
+        "--qase-rate-limit",
+        type=float,
+        default=0,
+        help=(
+            "Specify max number of Qase API requests per second per process, "
+            "rate is decreased automatically once Qase throttles requests. "
+            "Limit is disabled by default"
+        ),
+    )
+    parser.addoption(
+        "--qase-create-run-timeout",
+        type=float,
+        default=300,
+        help=(
+            "Specify max number of seconds to wait for creation of test run, "
+            "once it's exceeded, run is looked up in Qase or created again. "
+            "Use 0 to wait without limit"
+        ),
+    )
+    parser.addoption(
+        "--qase-aggregate-results",
+        action="store_true",
+        default=False,
+        help=(
+            "Send single result per case for parametrized tests sharing "
+            "case, once all of them finished"
+        ),
+    )
+    parser.addoption(
+        "--qase-max-stacktrace-size",
+        type=int,
+        default=65536,
+        help=(
+            "Specify max size of stacktrace of result in bytes, longer "
+            "stacktrace is truncated and uploaded to file storage. "
+            "Use 0 to disable limit"
+        ),
+    )
+    parser.addoption(
+        "--qase-max-comment-size",
+        type=int,
+        default=16384,
+        help=(
+            "Specify max size of comment of result in bytes, longer comment "
+            "is truncated and uploaded to file storage. Use 0 to disable limit"
+        ),
+    )
+    parser.addoption(
+        "--qase-spool",
+        default=None,
+        help=(
+            "Save results and debug files to specified directory instead of "
+            "sending them to Qase, use `pytest-qaseio-upload` command to "
+            "upload them"
+        ),
+    )
+    parser.addoption(
+        "--qase-batch-size",
+        type=int,
+        default=100,
+        help="Specify number of results to send to Qase in a single request",
+    )
+    parser.addoption(
+        "--qase-flush-interval",
+        type=_positive_float,
+        default=30,
+        help=(
+            "Specify max number of seconds to keep results in buffer "
+            "before sending them to Qase"
+        ),
+    )
+    parser.addoption(
+        "--qase-queue-size",
+        type=int,
+        default=1000,
+        help="Specify max number of results waiting to be sent to Qase",
+    )
+    parser.addoption(
+        "--qase-drain-timeout",
+        type=float,
+        default=300,
+        help=(
+            "Specify max number of seconds to wait for sending remaining "
+            "results to Qase at the end of session"
+        ),
+    )
+    parser.addoption(
+        "--qase-journal",
+        default=".pytest-qaseio-journal",
+        help=(
+            "Specify directory of journal of results which are not sent to "
+            "Qase yet, so they can be sent with `--qase-resume` after crash. "
+            "Use `none` to disable journal"
+        ),
+    )
+    parser.addoption(
+        "--qase-resume",
+        action="store_true",
+        default=False,
+        help=(
+            "Send results left in journal by crashed session to their runs "
+            "and exit without running tests"
+        ),
+    )
+    parser.addoption(
+        "--qase-metrics",
+        default=None,
+        help=(
+            "Write metrics of requests to Qase API and file storage to "
+            "specified json file"
+        ),
+    )
 
 
 def pytest_addhooks(pluginmanager: pytest.PytestPluginManager) -> None:
@@ -47,14 +304,25 @@ def pytest_addhooks(pluginmanager: pytest.PytestPluginManager) -> None:
     pluginmanager.add_hookspecs(hooks)
 
 
-def _get_file_storage(config: pytest.Config) -> storage.FileStorage | None:
-    """Provide file storage via pytest config."""
+def _get_file_storage(config: pytest.Config) -> "storage.FileStorage | None":
+    """Provide file storage via pytest config.
+
+    If results are spooled, files are saved to spool too.
+
+    """
+    from . import spool
+
     file_storage_name: str = config.getoption("--qase-file-storage")
     if file_storage_name.lower() == "none":
         return None
 
+    if spool_path := config.getoption("--qase-spool"):
+        return spool.SpoolFileStorage(
+            spool=spool.ResultsSpool(path=pathlib.Path(spool_path)),
+        )
+
     file_storages: dict[str, storage.FileStorage] = (
-        config.hook.pytest_qase_file_storages()
+        config.hook.pytest_qase_file_storages(config=config)
     )
 
     if file_storage_name not in file_storages:
@@ -68,14 +336,47 @@ def _get_file_storage(config: pytest.Config) -> storage.FileStorage | None:
 
 
 @pytest.hookimpl(trylast=True)
-def pytest_qase_file_storages() -> dict[str, storage.FileStorage]:
-    """Provide mapping of available file storages for qase debug files."""
-    return {
+def pytest_qase_file_storages(
+    config: pytest.Config,
+) -> "dict[str, storage.FileStorage]":
+    """Provide mapping of available file storages for qase debug files.
+
+    `s3` storage is available only if `QASE_S3_BUCKET` is set.
+
+    """
+    from . import storage
+
+    file_storages: dict[str, storage.FileStorage] = {
         "qase": storage.QaseFileStorage(
             qase_token=os.environ["QASE_TOKEN"],
             qase_project_code=os.environ["QASE_PROJECT_CODE"],
+            connection_pool_size=config.getoption(
+                "--qase-connection-pool-size",
+            ),
+            qase_host=os.getenv("QASE_API_HOST"),
+        ),
+        "local": storage.LocalFileStorage(
+            path=pathlib.Path(config.getoption("--qase-local-storage-dir")),
+            base_url=config.getoption("--qase-local-storage-url"),
         ),
     }
+    if (s3_bucket := os.getenv("QASE_S3_BUCKET")) and (
+        config.getoption("--qase-file-storage") == "s3"
+    ):
+        # Client is created only if storage is used, since it requires
+        # optional dependency
+        multipart_chunk_size: int = config.getoption(
+            "--qase-s3-multipart-chunk-size",
+        )
+        file_storages["s3"] = storage.S3FileStorage(
+            bucket=s3_bucket,
+            endpoint_url=os.getenv("QASE_S3_ENDPOINT_URL"),
+            public_url=os.getenv("QASE_S3_PUBLIC_URL"),
+            multipart_threshold=multipart_chunk_size,
+            multipart_chunk_size=multipart_chunk_size,
+            max_concurrency=config.getoption("--qase-s3-max-concurrency"),
+        )
+    return file_storages
 
 
 @pytest.hookimpl(trylast=True)
@@ -85,10 +386,18 @@ def pytest_qase_browser_name(config: pytest.Config) -> str:
 
 
 @pytest.hookimpl(trylast=True)
-def pytest_get_debug_info(item: pytest.Function) -> DebugInfo | None:
+def pytest_get_debug_info(item: pytest.Function) -> "DebugInfo | None":
     """Try to get selenium debug info object."""
+    from .debug_info import SeleniumDebugInfo
+
+    tmp_dir: str | None = item.config.getoption("--qase-artifacts-tmp-dir")
     return (
-        SeleniumDebugInfo(item._webdriver)  # type: ignore
+        SeleniumDebugInfo(
+            item._webdriver,  # type: ignore
+            upload_timeout=item.config.getoption("--qase-upload-timeout"),
+            tmp_dir=pathlib.Path(tmp_dir) if tmp_dir else None,
+            capture_timeout=item.config.getoption("--qase-capture-timeout"),
+        )
         if hasattr(item, "_webdriver")
         else None
     )
@@ -131,168 +440,29 @@ def pytest_configure(config: pytest.Config) -> None:
     if not qase_enabled:
         return
 
+    from .plugin_exceptions import MissingDependency
+    from .qase_plugin import QasePlugin
+
     browser_name: str = config.hook.pytest_qase_browser_name(config=config)
+    try:
+        file_storage = _get_file_storage(config)
+    except MissingDependency as error:
+        raise pytest.UsageError(error.message) from error
 
     config.pluginmanager.register(
         plugin=QasePlugin(
             browser=browser_name,
-            file_storage=_get_file_storage(config),
+            file_storage=file_storage,
             config=config,
         ),
         name="qase_plugin",
     )
 
 
-class QasePlugin:
-    """Pytest plugin for reporting tests result to Qase."""
-
-    # We use .pytest-qaseio.lock to lock process, in other words make other
-    # workers wait, until worker that locked file will create run and store
-    # run's id in .pytest-qaseio. After other
-    # workers load run by id from .pytest-qaseio.
-    __run_file = pathlib.Path(".pytest-qaseio")
-    __run_file_lock = pathlib.Path(".pytest-qaseio.lock")
-
-    def __init__(
-        self,
-        browser: str,
-        file_storage: storage.FileStorage | None,
-        config: pytest.Config,
-    ) -> None:
-        """Save used browser for run's name and folder name."""
-        self._config = config
-        self._client = api_client.QaseClient(
-            token=os.environ["QASE_TOKEN"],
-            project_code=os.environ["QASE_PROJECT_CODE"],
-            retries=config.getoption("--qase-api-retries"),
-        )
-        self._cases_ids_from_api: list[int] = self._client.load_cases_ids()
-        self._current_run: Run | None = None
-        self._converter = converter.QaseConverter(
-            browser=browser,
-            env=os.environ["ENVIRONMENT"],
-            project_code=os.environ["QASE_PROJECT_CODE"],
-            file_storage=file_storage,
-            config=self._config,
-        )
+def __getattr__(name: str) -> "type[qase_plugin.QasePlugin]":
+    """Import `QasePlugin` lazily, keeping its old import path working."""
+    if name == "QasePlugin":
+        from .qase_plugin import QasePlugin
 
-        # Mapping of pytest items ids and case id
-        self._tests: dict[str, int | None] = {}
-        # Mapping of case ids and result hash from qase with status
-        self._qase_results: dict[int, tuple[str, ResultCreate]] = {}
-
-    def pytest_sessionstart(self, session: pytest.Session) -> None:
-        """Clear previously saved run, prepare lock file."""
-        if hasattr(session.config, "workerinput"):
-            # Do nothing if it is not master thread
-            return
-        self.__run_file.unlink(missing_ok=True)
-        self.__run_file_lock.touch(exist_ok=True)
-
-    @pytest.hookimpl(trylast=True)
-    def pytest_collection_modifyitems(
-        self,
-        items: list[pytest.Function],
-    ) -> None:
-        """Create test run in qase."""
-        with filelock.FileLock(self.__run_file_lock):
-            try:
-                run_data, self._tests = self._converter.prepare_run_data(
-                    cases_ids_from_api=self._cases_ids_from_api,
-                    items=items,
-                )
-
-                # Specifying plan allows to create run "from template".
-                # New run will contain all cases from plan + cases that
-                # specified in tests
-                if plan_id := os.getenv("QASE_PLAN_ID"):
-                    run_data.plan_id = int(plan_id)
-
-                if environment_id := os.getenv("QASE_ENVIRONMENT_ID"):
-                    run_data.environment_id = int(environment_id)
-
-                if qase_url_custom_field_id := os.getenv(
-                    "QASE_URL_CUSTOM_FIELD_ID",
-                ):
-                    run_data.custom_field = {
-                        # This should be provided from script that runs test,
-                        # f.e jenkins script
-                        qase_url_custom_field_id: os.getenv("RUN_SOURCE_URL")
-                        or "",
-                    }
-
-                self._current_run = self._load_run_from_file()
-                if self._current_run:
-                    return
-
-                self._current_run = self._client.create_run(
-                    run_data=run_data,
-                )
-                with pathlib.Path(self.__run_file).open(mode="w") as lock_file:
-                    lock_file.write(str(self._current_run.id))
-            except plugin_exceptions.BaseQasePluginException as e:
-                pytest.exit(e.message)
-
-    @pytest.hookimpl(tryfirst=True, hookwrapper=True)
-    def pytest_runtest_makereport(self, item: pytest.Function):  # noqa: ANN201
-        """Represent standard pytest hook on test completion.
-
-        At this hook we will report passed, skipped and failed tests.
-
-        """
-        provided_report = yield
-        report: pytest.TestReport = provided_report.get_result()
-        should_report = not (
-            # Passed tests should be reported only on call
-            report.passed and report.when in ("setup", "teardown")
-        )
-        if not should_report:
-            return
-
-        case_id = self._tests[item.nodeid]
-        if not case_id:
-            return
-
-        if not self._current_run:
-            raise plugin_exceptions.RunNotConfigured()
-        try:
-            self._qase_results[case_id] = self._client.report_test_results(
-                run=self._current_run,
-                report_data=self._converter.prepare_report_data(
-                    run_id=typing.cast(int, self._current_run.id),
-                    case_id=case_id,
-                    item=item,
-                    report=report,
-                ),
-            )
-
-        except ApiException as error:
-            if report.passed:
-                return
-            # Qase closes runs, once every case got result.
-            # So if try to report any other result,
-            # we'll get an error `Test run is not active`.
-            terminal_reporter: pytest.TerminalReporter = (
-                item.config.pluginmanager.get_plugin(
-                    "terminalreporter",  # type: ignore
-                )
-            )
-            terminal_reporter.ensure_newline()
-            terminal_reporter.section(
-                f"{error}. "
-                f"Seems that Qase closed run, "
-                f"and we are unable to report failed {item.name}",
-                sep="=",
-            )
-
-    def _load_run_from_file(
-        self,
-    ) -> Run | None:
-        """Load run id and then load it from qase."""
-        if not self.__run_file.exists():
-            return None
-        with pathlib.Path(self.__run_file).open() as lock_file:
-            run_id = int(lock_file.read())
-            return self._client.get_run(
-                run_id=run_id,
-            )
+        return QasePlugin
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
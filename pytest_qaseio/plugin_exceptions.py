@@ -44,3 +44,7 @@ class RunNotConfigured(BaseQasePluginException):
     """Exception that signifies that test run not configured."""
 
     message = "Test run not configured"
+
+
+class MissingDependency(BaseQasePluginException):
+    """Exception that signifies that optional dependency isn't installed."""
@@ -0,0 +1,781 @@
+import http
+import os
+import pathlib
+import typing
+
+import filelock
+import pytest
+from qase.api_client_v1.exceptions import ApiException
+from qase.api_client_v1.models.result_create import ResultCreate
+from qase.api_client_v1.models.run import Run
+from qase.api_client_v1.models.run_create import RunCreate
+
+from . import (
+    api_client,
+    artifacts,
+    cases_cache,
+    cases_index,
+    constants,
+    converter,
+    files_cache,
+    journal,
+    metrics,
+    plugin_exceptions,
+    rate_limiter,
+    results_aggregator,
+    results_buffer,
+    results_sender,
+    spool,
+    storage,
+    tests_cases,
+)
+
+
+class QasePlugin:
+    """Pytest plugin for reporting tests result to Qase."""
+
+    # We use .pytest-qaseio.lock to lock process, in other words make other
+    # workers wait, until worker that locked file will create run and store
+    # run's id in .pytest-qaseio. After other
+    # workers load run by id from .pytest-qaseio.
+    __run_file = pathlib.Path(".pytest-qaseio")
+    __run_file_lock = pathlib.Path(".pytest-qaseio.lock")
+
+    def __init__(
+        self,
+        browser: str,
+        file_storage: storage.FileStorage | None,
+        config: pytest.Config,
+    ) -> None:
+        """Save used browser for run's name and folder name."""
+        self._config = config
+        self._check_aggregation_dist_mode()
+        # `cache` is missing if `cacheprovider` plugin is disabled
+        pytest_cache: pytest.Cache | None = getattr(config, "cache", None)
+        self._spool: spool.ResultsSpool | None = None
+        if spool_path := config.getoption("--qase-spool"):
+            self._spool = spool.ResultsSpool(path=pathlib.Path(spool_path))
+        rate_limit: float = config.getoption("--qase-rate-limit")
+        # Metrics of requests to Qase API and file storage
+        self._metrics = metrics.ApiMetrics()
+        self._client = api_client.QaseClient(
+            # Spooled results are uploaded by separate command, so token
+            # isn't required to run tests
+            token=(
+                os.getenv("QASE_TOKEN", "")
+                if self._spool
+                else os.environ["QASE_TOKEN"]
+            ),
+            project_code=os.environ["QASE_PROJECT_CODE"],
+            retries=config.getoption("--qase-api-retries"),
+            connection_pool_size=config.getoption(
+                "--qase-connection-pool-size",
+            ),
+            limiter=(
+                rate_limiter.RateLimiter(
+                    max_rate=rate_limit,
+                    # Throttling is shared by all processes of session
+                    state_file=(
+                        pytest_cache.mkdir("pytest-qaseio") / "rate-limit.json"
+                        if pytest_cache
+                        else None
+                    ),
+                )
+                if rate_limit > 0
+                else None
+            ),
+            api_metrics=self._metrics,
+            host=os.getenv("QASE_API_HOST"),
+        )
+        self._cases_cache: cases_cache.CasesCache | None = None
+        cases_cache_ttl: float = config.getoption("--qase-cases-cache-ttl")
+        if pytest_cache and cases_cache_ttl > 0:
+            self._cases_cache = cases_cache.CasesCache(
+                cache_dir=pytest_cache.mkdir("pytest-qaseio"),
+                project_code=os.environ["QASE_PROJECT_CODE"],
+                ttl=cases_cache_ttl,
+            )
+        if file_storage:
+            # Only real uploads are measured, not deduplicated ones
+            file_storage = storage.measure(
+                file_storage=file_storage,
+                api_metrics=self._metrics,
+            )
+        artifacts_tmp_dir: str | None = config.getoption(
+            "--qase-artifacts-tmp-dir",
+        )
+        try:
+            self._artifacts_processor = artifacts.ArtifactsProcessor(
+                image_format=config.getoption("--qase-screenshot-format"),
+                image_quality=config.getoption("--qase-screenshot-quality"),
+                max_image_size=config.getoption("--qase-screenshot-max-size"),
+                compress_text=config.getoption("--qase-compress-text-files"),
+                tmp_dir=(
+                    pathlib.Path(artifacts_tmp_dir)
+                    if artifacts_tmp_dir
+                    else None
+                ),
+            )
+        except plugin_exceptions.MissingDependency as error:
+            raise pytest.UsageError(error.message) from error
+        if file_storage and self._artifacts_processor.enabled:
+            # Files are deduplicated before processing, so identical files
+            # aren't processed again
+            file_storage = storage.process(
+                file_storage=file_storage,
+                processor=self._artifacts_processor,
+            )
+        self._files_cache: files_cache.UploadedFilesCache | None = None
+        deduplicate_files: str = config.getoption("--qase-deduplicate-files")
+        if file_storage and deduplicate_files != "none":
+            files_cache_dir: pathlib.Path | None = None
+            if deduplicate_files == "disk" and self._spool:
+                # Spooled files are valid only within their spool
+                files_cache_dir = self._spool.path / "files-cache"
+            elif deduplicate_files == "disk" and pytest_cache:
+                # Cache rejects nested names, so subdirectory is created
+                # manually
+                files_cache_dir = pytest_cache.mkdir("pytest-qaseio") / (
+                    "files-" + config.getoption("--qase-file-storage")
+                )
+                files_cache_dir.mkdir(parents=True, exist_ok=True)
+            self._files_cache = files_cache.UploadedFilesCache(
+                cache_dir=files_cache_dir,
+            )
+            file_storage = storage.deduplicate(
+                file_storage=file_storage,
+                cache=self._files_cache,
+            )
+        self._current_run: Run | None = None
+        # Session of xdist controller to collect tests for run
+        self._session: pytest.Session | None = None
+        self._converter = converter.QaseConverter(
+            browser=browser,
+            env=os.environ["ENVIRONMENT"],
+            project_code=os.environ["QASE_PROJECT_CODE"],
+            file_storage=file_storage,
+            config=self._config,
+            api_metrics=self._metrics,
+        )
+
+        # Mapping of pytest items and case ids
+        self._tests = tests_cases.TestsCases()
+        # Results of parametrized tests sharing case, which are combined
+        # into single result once all tests of case finished
+        self._results_aggregator: (
+            results_aggregator.ResultsAggregator | None
+        ) = None
+        # Errors of bulk requests which were rejected by qase and ids of
+        # cases of not passed results, errors are kept as messages to not
+        # keep whole responses
+        self._unreported_results: list[tuple[str, list[int]]] = []
+        # Results are sent to qase in bulk from background thread, so tests
+        # don't wait for qase responses
+        self._results_sender = results_sender.BackgroundResultsSender(
+            send_results=self._send_results,
+            batch_size=config.getoption("--qase-batch-size"),
+            flush_interval=config.getoption("--qase-flush-interval"),
+            queue_size=config.getoption("--qase-queue-size"),
+        )
+        # Results are journaled before sending, so they aren't lost if
+        # process crashes before they are sent
+        self._journal: journal.ResultsJournal | None = None
+        journal_dir: str = config.getoption("--qase-journal")
+        if journal_dir != "none" and not self._spool:
+            self._journal = journal.ResultsJournal.for_process(
+                journal_dir=pathlib.Path(journal_dir),
+            )
+        self._results_sender.start()
+        self._results_drained = True
+        # Numbers of results which weren't sent in time and results left in
+        # journal, including ones of xdist workers
+        self._unsent_results = 0
+        self._journal_pending_results = 0
+
+    def pytest_sessionstart(self, session: pytest.Session) -> None:
+        """Clear previously saved run, prepare lock file.
+
+        If tests are run with xdist, controller collects tests and creates
+        run by itself, so workers get ready run via `workerinput`.
+
+        """
+        if hasattr(session.config, "workerinput"):
+            # Do nothing if it is not master thread
+            return
+        if self._config.getoption("--qase-resume"):
+            pytest.exit(self._resume_results(), returncode=0)
+        if self._is_xdist_controller:
+            # Run is created by controller before workers start
+            self._session = session
+            return
+        self.__run_file.unlink(missing_ok=True)
+        self.__run_file_lock.touch(exist_ok=True)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_configure_node(self, node: typing.Any) -> None:
+        """Pass id of run created by xdist controller to worker.
+
+        Controller doesn't collect tests by default, so tests are collected
+        before configuring of first worker. Collected items are handled by
+        `pytest_collection_modifyitems`, which creates run.
+
+        """
+        if not self._current_run and self._session:
+            self._collect_in_controller(self._session)
+            self._session = None
+        if self._current_run:
+            node.workerinput["qase_run_id"] = self._current_run.id
+
+    def _collect_in_controller(self, session: pytest.Session) -> None:
+        """Collect tests in xdist controller without reporting collection.
+
+        Terminal reporter is detached during collection, since workers
+        report their own collection. Otherwise controller prints extra
+        "collected N items" line and counts collection errors twice.
+
+        """
+        plugin_manager = self._config.pluginmanager
+        reporter = plugin_manager.get_plugin("terminalreporter")
+        if reporter:
+            plugin_manager.unregister(reporter)
+        try:
+            session.perform_collect()
+        finally:
+            if reporter:
+                # Registration replays config time warnings to reporter,
+                # they are already recorded by it
+                warnings = list(reporter.stats.get("warnings", []))
+                plugin_manager.register(reporter, "terminalreporter")
+                if warnings:
+                    reporter.stats["warnings"] = warnings
+                else:
+                    reporter.stats.pop("warnings", None)
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_collection_modifyitems(
+        self,
+        items: list[pytest.Function],
+    ) -> None:
+        """Create test run in qase.
+
+        Xdist workers use run created by controller, without any requests
+        to qase. Other processes share run via `.pytest-qaseio` file.
+
+        """
+        try:
+            workerinput = getattr(self._config, "workerinput", {})
+            if "qase_run_id" in workerinput:
+                # Cases are already validated by controller
+                self._tests = self._converter.map_tests_to_cases(items=items)
+                self._current_run = Run(id=workerinput["qase_run_id"])
+                return
+
+            if self._is_xdist_controller:
+                self._current_run = self._create_run(
+                    run_data=self._prepare_run_data(items=items),
+                )
+                return
+
+            with filelock.FileLock(self.__run_file_lock):
+                run_data = self._prepare_run_data(items=items)
+                self._current_run = self._load_run_from_file()
+                if self._current_run:
+                    return
+
+                self._current_run = self._create_run(run_data=run_data)
+                with pathlib.Path(self.__run_file).open(mode="w") as lock_file:
+                    lock_file.write(str(self._current_run.id))
+        except plugin_exceptions.BaseQasePluginException as e:
+            pytest.exit(e.message)
+
+    def pytest_collection_finish(self) -> None:
+        """Prepare aggregation of results of tests sharing case."""
+        if not self._config.getoption("--qase-aggregate-results"):
+            return
+        self._results_aggregator = results_aggregator.ResultsAggregator(
+            tests_per_case=self._tests.tests_per_case,
+        )
+
+    def _check_aggregation_dist_mode(self) -> None:
+        """Check that xdist runs all tests of case in the same worker.
+
+        Each worker aggregates results of tests of case it ran, so if tests
+        of case are spread across workers, each of them sends partial
+        result, which overwrites others in Qase.
+
+        """
+        dist_mode: str = self._config.getoption("dist", "no")
+        if (
+            self._config.getoption("--qase-aggregate-results")
+            and dist_mode not in constants.AGGREGATION_DIST_MODES
+        ):
+            xdist_modes = ", ".join(
+                mode
+                for mode in constants.AGGREGATION_DIST_MODES
+                if mode != "no"
+            )
+            raise pytest.UsageError(
+                f"`--qase-aggregate-results` doesn't work with "
+                f"`--dist={dist_mode}`, since tests of case can run in "
+                f"different xdist workers. Use one of `--dist` modes: "
+                f"{xdist_modes}",
+            )
+
+    @property
+    def _is_xdist_controller(self) -> bool:
+        """Check if current process is controller of xdist workers."""
+        return self._config.pluginmanager.has_plugin("dsession")
+
+    def _prepare_run_data(
+        self,
+        items: list[pytest.Function],
+    ) -> RunCreate:
+        """Validate cases of tests and prepare data to create run."""
+        run_data, self._tests = self._converter.prepare_run_data(
+            cases_ids_from_api=self._load_cases_ids(items=items),
+            items=items,
+        )
+
+        # Specifying plan allows to create run "from template".
+        # New run will contain all cases from plan + cases that
+        # specified in tests
+        if plan_id := os.getenv("QASE_PLAN_ID"):
+            run_data.plan_id = int(plan_id)
+
+        if environment_id := os.getenv("QASE_ENVIRONMENT_ID"):
+            run_data.environment_id = int(environment_id)
+
+        if qase_url_custom_field_id := os.getenv(
+            "QASE_URL_CUSTOM_FIELD_ID",
+        ):
+            run_data.custom_field = {
+                # This should be provided from script that runs test,
+                # f.e jenkins script
+                qase_url_custom_field_id: os.getenv("RUN_SOURCE_URL") or "",
+            }
+        return run_data
+
+    @pytest.hookimpl(tryfirst=True, hookwrapper=True)
+    def pytest_runtest_makereport(self, item: pytest.Function):  # noqa: ANN201
+        """Represent standard pytest hook on test completion.
+
+        At this hook we will report passed, skipped and failed tests.
+
+        """
+        provided_report = yield
+        report: pytest.TestReport = provided_report.get_result()
+        case_id = self._tests.get(item)
+        if not case_id:
+            return
+        if not self._current_run:
+            raise plugin_exceptions.RunNotConfigured()
+
+        should_report = not (
+            # Passed tests should be reported only on call
+            report.passed and report.when in ("setup", "teardown")
+        )
+        if should_report:
+            result = self._converter.prepare_report_data(
+                run_id=typing.cast(int, self._current_run.id),
+                case_id=case_id,
+                item=item,
+                report=report,
+            )
+            if not self._results_aggregator:
+                self._report_result(result)
+                return
+            self._results_aggregator.add(
+                case_id=case_id,
+                test_id=(
+                    item.callspec.id
+                    if hasattr(item, "callspec")
+                    else item.name
+                ),
+                result=result,
+            )
+        if self._results_aggregator and report.when == "teardown":
+            aggregated_results = self._results_aggregator.finish_test(case_id)
+            if aggregated_results:
+                self._report_result(
+                    self._converter.aggregate_results(
+                        case_id=case_id,
+                        run_id=typing.cast(int, self._current_run.id),
+                        results=aggregated_results,
+                    ),
+                )
+
+    def pytest_sessionfinish(self) -> None:
+        """Wait until remaining results are sent to qase."""
+        if self._results_aggregator and self._current_run:
+            # Not all tests of cases could run (f.e. because of `-x`)
+            for (
+                case_id,
+                results,
+            ) in self._results_aggregator.pop_results().items():
+                self._report_result(
+                    self._converter.aggregate_results(
+                        case_id=case_id,
+                        run_id=typing.cast(int, self._current_run.id),
+                        results=results,
+                    ),
+                )
+        # Results of xdist workers could be already merged
+        if not self._results_sender.stop(
+            timeout=self._config.getoption("--qase-drain-timeout"),
+        ):
+            self._results_drained = False
+            self._unsent_results += self._results_sender.queue_depth
+        if self._journal:
+            self._journal.close()
+            self._journal_pending_results += self._journal.pending
+        workeroutput = getattr(self._config, "workeroutput", None)
+        if workeroutput is not None:
+            # Metrics and results of workers are merged by xdist controller
+            workeroutput["qase_metrics"] = self._metrics.to_dict()
+            workeroutput["qase_results"] = {
+                "peak_queue_depth": self._results_sender.peak_queue_depth,
+                "drain_time": self._results_sender.drain_time,
+                "drained": self._results_drained,
+                "unsent": self._unsent_results,
+                "journal_pending": self._journal_pending_results,
+                "unreported": self._unreported_results,
+            }
+            workeroutput["qase_artifacts_bytes"] = (
+                self._artifacts_processor.bytes_before,
+                self._artifacts_processor.bytes_after,
+            )
+            if self._files_cache:
+                workeroutput["qase_files_cache_stats"] = (
+                    self._files_cache.hits,
+                    self._files_cache.misses,
+                )
+        elif metrics_path := self._config.getoption("--qase-metrics"):
+            self._metrics.save(pathlib.Path(metrics_path))
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node: typing.Any, error: typing.Any) -> None:
+        """Merge metrics and results statistics of finished xdist worker."""
+        workeroutput = getattr(node, "workeroutput", {})
+        if "qase_metrics" in workeroutput:
+            self._metrics.merge(workeroutput["qase_metrics"])
+        if "qase_artifacts_bytes" in workeroutput:
+            self._artifacts_processor.merge(
+                *workeroutput["qase_artifacts_bytes"],
+            )
+        if self._files_cache and "qase_files_cache_stats" in workeroutput:
+            self._files_cache.merge(*workeroutput["qase_files_cache_stats"])
+        if "qase_results" in workeroutput:
+            results = workeroutput["qase_results"]
+            self._results_sender.merge(
+                peak_queue_depth=results["peak_queue_depth"],
+                drain_time=results["drain_time"],
+            )
+            self._results_drained = (
+                self._results_drained and results["drained"]
+            )
+            self._unsent_results += results["unsent"]
+            self._journal_pending_results += results["journal_pending"]
+            self._unreported_results.extend(
+                (error, list(cases_ids))
+                for error, cases_ids in results["unreported"]
+            )
+
+    def pytest_terminal_summary(
+        self,
+        terminalreporter: pytest.TerminalReporter,
+    ) -> None:
+        """Show statistics of sending results to qase."""
+        terminalreporter.section("qase", sep="-")
+        terminalreporter.line(
+            f"Peak results queue depth: "
+            f"{self._results_sender.peak_queue_depth}",
+        )
+        terminalreporter.line(
+            f"Results queue drain time: "
+            f"{self._results_sender.drain_time:.2f}s",
+        )
+        pool_stats = self._client.connection_pool_stats
+        terminalreporter.line(
+            f"Qase API connections opened: {pool_stats['connections']}, "
+            f"requests sent: {pool_stats['requests']}",
+        )
+        for line in self._metrics.format_summary():
+            terminalreporter.line(line)
+        if self._files_cache:
+            files_lookups = self._files_cache.hits + self._files_cache.misses
+            terminalreporter.line(
+                f"Debug files deduplicated: {self._files_cache.hits} "
+                f"of {files_lookups}",
+            )
+        if self._artifacts_processor.bytes_before:
+            terminalreporter.line(
+                f"Debug files processed before upload: "
+                f"{self._artifacts_processor.bytes_before} bytes reduced to "
+                f"{self._artifacts_processor.bytes_after} bytes, "
+                f"{self._artifacts_processor.bytes_saved} bytes saved",
+            )
+        if self._journal_pending_results:
+            terminalreporter.line(
+                f"{self._journal_pending_results} results are left in "
+                f"journal, use `--qase-resume` to send them to Qase",
+                red=True,
+            )
+        if not self._results_drained:
+            terminalreporter.line(
+                f"Unable to send {self._unsent_results} results "
+                f"to Qase in time, increase `--qase-drain-timeout`",
+                red=True,
+            )
+        for error, cases_ids in self._unreported_results:
+            # Qase closes runs, once every case got result.
+            # So if try to report any other result,
+            # we'll get an error `Test run is not active`.
+            terminalreporter.line(
+                f"{error}. "
+                f"Seems that Qase closed run, "
+                f"and we are unable to report results of cases: "
+                f"{', '.join(str(case_id) for case_id in cases_ids)}",
+                red=True,
+            )
+
+    def _report_result(self, result: ResultCreate) -> None:
+        """Journal result and put it to queue for sending to qase."""
+        if not self._current_run:
+            raise plugin_exceptions.RunNotConfigured()
+        entry_id = (
+            self._journal.append(
+                run_id=typing.cast(int, self._current_run.id),
+                result=result,
+            )
+            if self._journal
+            else None
+        )
+        self._results_sender.put(
+            results_buffer.QueuedResult(result=result, entry_id=entry_id),
+        )
+
+    def _send_results(
+        self,
+        queued_results: list[results_buffer.QueuedResult],
+    ) -> None:
+        """Send results to qase in bulk.
+
+        Called from background thread of results sender. Results are sent
+        and acknowledged in journal by chunks accepted by single bulk
+        request, so chunks sent before failed one aren't sent again on
+        resume.
+
+        """
+        if not self._current_run:
+            raise plugin_exceptions.RunNotConfigured()
+        if self._spool:
+            self._spool.save_results(
+                [queued.result for queued in queued_results],
+            )
+            return
+        if self._journal:
+            self._journal.sync()
+        chunk_size = self._client.bulk_results_limit
+        for start in range(0, len(queued_results), chunk_size):
+            chunk = queued_results[start : start + chunk_size]
+            try:
+                self._client.report_test_results_bulk(
+                    run=self._current_run,
+                    results=[queued.result for queued in chunk],
+                )
+            except ApiException as error:
+                if _is_rejected(error):
+                    # Results rejected by qase won't be accepted on resume
+                    self._acknowledge(chunk)
+                not_passed_cases_ids = [
+                    typing.cast(int, queued.result.case_id)
+                    for queued in chunk
+                    if queued.result.status != "passed"
+                ]
+                if not_passed_cases_ids:
+                    self._unreported_results.append(
+                        (str(error), not_passed_cases_ids),
+                    )
+                continue
+            self._acknowledge(chunk)
+
+    def _acknowledge(
+        self,
+        queued_results: list[results_buffer.QueuedResult],
+    ) -> None:
+        """Mark results as confirmed by qase in journal."""
+        if not self._journal:
+            return
+        self._journal.acknowledge(
+            queued.entry_id
+            for queued in queued_results
+            if queued.entry_id is not None
+        )
+
+    def _resume_results(self) -> str:
+        """Send results left in journals to their runs.
+
+        Journal is removed once all its results are sent. If results can't
+        be sent because of network error, sending is stopped and journals
+        are kept.
+
+        """
+        journal_dir: str = self._config.getoption("--qase-journal")
+        if journal_dir == "none":
+            return "Journal is disabled, nothing to resume"
+        sent_results = 0
+        left_results = 0
+        network_error: Exception | None = None
+        for path in sorted(pathlib.Path(journal_dir).glob("journal-*.jsonl")):
+            results_journal = journal.ResultsJournal(path=path)
+            if network_error:
+                # Results are loaded only to keep journal
+                results_journal.load_pending()
+            else:
+                journal_sent_results, network_error = self._resume_journal(
+                    results_journal,
+                )
+                sent_results += journal_sent_results
+            left_results += results_journal.pending
+            results_journal.close()
+        message = (
+            f"Resumed sending of results to Qase: {sent_results} sent, "
+            f"{left_results} left in journal"
+        )
+        if network_error:
+            message += f", sending is stopped because of {network_error!r}"
+        return message
+
+    def _resume_journal(
+        self,
+        results_journal: journal.ResultsJournal,
+    ) -> tuple[int, Exception | None]:
+        """Send results left in journal.
+
+        Results are sent and acknowledged by chunks accepted by single bulk
+        request, so chunks sent before failed one aren't sent again.
+        Sending is stopped on network error (f.e. connection error), since
+        other requests will fail too.
+
+        Return number of sent results and network error if any.
+
+        """
+        sent_results = 0
+        chunk_size = self._client.bulk_results_limit
+        for run_id, results in results_journal.load_pending().items():
+            entries_ids = list(results)
+            for start in range(0, len(entries_ids), chunk_size):
+                chunk = entries_ids[start : start + chunk_size]
+                try:
+                    self._client.report_test_results_bulk(
+                        run=Run(id=run_id),
+                        results=[results[entry_id] for entry_id in chunk],
+                    )
+                except ApiException as error:
+                    if not _is_rejected(error):
+                        continue
+                except Exception as error:  # noqa: BLE001
+                    return sent_results, error
+                else:
+                    sent_results += len(chunk)
+                results_journal.acknowledge(chunk)
+        return sent_results, None
+
+    def _load_cases_ids(
+        self,
+        items: list[pytest.Function],
+    ) -> cases_index.CasesIndex:
+        """Load project cases ids from cache or from qase.
+
+        Cached cases ids are used only if they contain all cases specified
+        in tests, otherwise cache is refreshed, since new cases could be
+        added to project.
+
+        If `tests` cases validation is chosen, only cases specified in tests
+        are loaded from qase, which is much faster for small test suites in
+        big projects.
+
+        If results are spooled, cases are validated on upload of results.
+
+        """
+        if self._spool:
+            return cases_index.CasesIndex(
+                self._converter.collect_cases_ids(items=items),
+            )
+
+        if self._config.getoption("--qase-cases-validation") == "tests":
+            return self._client.load_existing_cases_ids(
+                cases_ids=self._converter.collect_cases_ids(items=items),
+            )
+
+        refresh_cache = self._config.getoption("--qase-refresh-cases-cache")
+        if self._cases_cache and not refresh_cache:
+            cached_cases_ids = self._cases_cache.load()
+            if cached_cases_ids is not None and (
+                self._converter.collect_cases_ids(items=items).issubset(
+                    cached_cases_ids,
+                )
+            ):
+                return cached_cases_ids
+
+        cases_ids = self._client.load_cases_ids()
+        if self._cases_cache:
+            self._cases_cache.save(cases_ids)
+        return cases_ids
+
+    def _create_run(
+        self,
+        run_data: RunCreate,
+    ) -> Run:
+        """Create run in qase or save it to spool.
+
+        Spooled run is created on upload of results, so it gets `0` id.
+        Chosen file storage is saved too, so spooled files are uploaded to
+        it. Spool of previous session isn't reused, since its results and
+        progress of its upload would be mixed with ones of new session.
+
+        """
+        if self._spool:
+            if self._spool.has_run():
+                raise pytest.UsageError(
+                    f"Spool directory `{self._spool.path}` contains results "
+                    "of previous session, upload them and remove directory "
+                    "or choose other one",
+                )
+            self._spool.save_run(run_data)
+            self._spool.save_file_storage(
+                self._config.getoption("--qase-file-storage"),
+            )
+            return Run(id=0)
+        create_run_timeout: float = self._config.getoption(
+            "--qase-create-run-timeout",
+        )
+        return self._client.create_run(
+            run_data=run_data,
+            timeout=create_run_timeout or None,
+        )
+
+    def _load_run_from_file(
+        self,
+    ) -> Run | None:
+        """Load run id and then load it from qase."""
+        if not self.__run_file.exists():
+            return None
+        with pathlib.Path(self.__run_file).open() as lock_file:
+            run_id = int(lock_file.read())
+            if self._spool:
+                return Run(id=run_id)
+            return self._client.get_run(
+                run_id=run_id,
+            )
+
+
+def _is_rejected(error: ApiException) -> bool:
+    """Check if request was rejected by qase (f.e. run is closed)."""
+    if not error.status or error.status == http.HTTPStatus.TOO_MANY_REQUESTS:
+        return False
+    return (
+        http.HTTPStatus.BAD_REQUEST
+        <= error.status
+        < http.HTTPStatus.INTERNAL_SERVER_ERROR
+    )
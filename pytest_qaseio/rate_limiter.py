@@ -0,0 +1,149 @@
+import email.utils
+import json
+import pathlib
+import tempfile
+import threading
+import time
+
+# Shared state older than this number of seconds is ignored, since it's
+# most likely left from previous session
+_SHARED_STATE_TTL = 60
+
+
+class RateLimiter:
+    """Adaptive token bucket limiting rate of requests to Qase API.
+
+    Each request takes token from bucket, which is refilled with `max_rate`
+    tokens per second. Once Qase responds with `429 Too Many Requests`, rate
+    is halved and requests are paused for time specified in `Retry-After`
+    header. After that, rate slowly grows back to `max_rate` with each
+    successful request.
+
+    If `state_file` is provided, throttling is shared between processes
+    (f.e. xdist workers), so all of them slow down once one of them is
+    throttled.
+
+    """
+
+    def __init__(
+        self,
+        max_rate: float,
+        state_file: pathlib.Path | None = None,
+    ) -> None:
+        """Init rate limiter."""
+        self._max_rate = max_rate
+        self._min_rate = max_rate / 100
+        self._rate = max_rate
+        # Bucket size allows short bursts of requests
+        self._capacity = max(max_rate, 1)
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._state_file = state_file
+        self._state_file_mtime = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def rate(self) -> float:
+        """Return current rate of requests per second."""
+        return self._rate
+
+    def acquire(self) -> None:
+        """Wait until request can be sent."""
+        with self._lock:
+            self._load_shared_state()
+            now = time.monotonic()
+            self._tokens = min(
+                self._capacity,
+                self._tokens + (now - self._updated_at) * self._rate,
+            )
+            self._updated_at = now
+            # Tokens are reserved in advance, so concurrent requests wait
+            # one after another instead of all at once
+            self._tokens -= 1
+            delay = max(
+                -self._tokens / self._rate,
+                self._paused_until - time.time(),
+            )
+        if delay > 0:
+            time.sleep(delay)
+
+    def on_success(self) -> None:
+        """Increase rate after successful request."""
+        with self._lock:
+            self._rate = min(
+                self._rate + self._max_rate / 100,
+                self._max_rate,
+            )
+
+    def throttle(self, retry_after: float | None) -> None:
+        """Decrease rate and pause requests after `429` response."""
+        with self._lock:
+            self._rate = max(self._rate / 2, self._min_rate)
+            self._tokens = min(self._tokens, 0)
+            self._paused_until = max(
+                self._paused_until,
+                time.time() + (retry_after or 1 / self._rate),
+            )
+            self._save_shared_state()
+
+    @staticmethod
+    def parse_retry_after(value: str | None) -> float | None:
+        """Parse `Retry-After` header to number of seconds.
+
+        Header can contain either number of seconds or HTTP date.
+
+        """
+        if not value:
+            return None
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        return max(retry_at.timestamp() - time.time(), 0)
+
+    def _load_shared_state(self) -> None:
+        """Apply throttling of other processes."""
+        if not self._state_file:
+            return
+        try:
+            mtime = self._state_file.stat().st_mtime
+            if mtime == self._state_file_mtime:
+                return
+            self._state_file_mtime = mtime
+            state = json.loads(self._state_file.read_text())
+            updated_at = float(state["updated_at"])
+            rate = float(state["rate"])
+            paused_until = float(state["paused_until"])
+        except (OSError, ValueError, TypeError, KeyError):
+            return
+        if time.time() - updated_at > _SHARED_STATE_TTL:
+            return
+        self._rate = max(min(self._rate, rate), self._min_rate)
+        self._paused_until = max(self._paused_until, paused_until)
+
+    def _save_shared_state(self) -> None:
+        """Share throttling with other processes."""
+        if not self._state_file:
+            return
+        self._state_file.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="w",
+            dir=self._state_file.parent,
+            prefix=f"{self._state_file.name}.",
+            delete=False,
+        ) as state_file:
+            json.dump(
+                {
+                    "updated_at": time.time(),
+                    "rate": self._rate,
+                    "paused_until": self._paused_until,
+                },
+                state_file,
+            )
+        pathlib.Path(state_file.name).replace(self._state_file)
+        self._state_file_mtime = self._state_file.stat().st_mtime
@@ -0,0 +1,74 @@
+import collections
+import collections.abc
+
+from qase.api_client_v1.models.result_create import ResultCreate
+
+
+class TestResult:
+    """Result of single test kept until all tests of its case finished.
+
+    Only fields needed for aggregation are kept instead of whole
+    `ResultCreate` model, since results of many tests can wait for
+    aggregation at once.
+
+    """
+
+    __slots__ = ("comment", "stacktrace", "status", "test_id", "time_ms")
+
+    # Prevent pytest from collecting class as tests
+    __test__ = False
+
+    def __init__(self, test_id: str, result: ResultCreate) -> None:
+        """Keep fields of result needed for aggregation."""
+        self.test_id = test_id
+        self.status: str = result.status  # type: ignore[assignment]
+        self.comment = result.comment
+        self.time_ms = result.time_ms
+        self.stacktrace = result.stacktrace
+
+
+class ResultsAggregator:
+    """Collect results of tests sharing single case until all of them finish.
+
+    Parametrized tests often share single case, so instead of result per
+    test, Qase gets single result per case once all its tests finished.
+
+    """
+
+    def __init__(
+        self,
+        tests_per_case: collections.abc.Mapping[int, int],
+    ) -> None:
+        """Init aggregator with expected number of tests of each case."""
+        self._tests_per_case = tests_per_case
+        # Number of finished tests of cases, which results aren't sent yet
+        self._finished_tests: collections.Counter[int] = collections.Counter()
+        # Mapping of case ids and results of their tests
+        self._results: dict[int, list[TestResult]] = collections.defaultdict(
+            list,
+        )
+
+    def add(self, case_id: int, test_id: str, result: ResultCreate) -> None:
+        """Add result of test of case."""
+        self._results[case_id].append(
+            TestResult(test_id=test_id, result=result),
+        )
+
+    def finish_test(self, case_id: int) -> list[TestResult] | None:
+        """Mark test of case as finished.
+
+        Return results of all tests of case once the last of them finished.
+
+        """
+        self._finished_tests[case_id] += 1
+        expected_tests = self._tests_per_case.get(case_id, 1)
+        if self._finished_tests[case_id] < expected_tests:
+            return None
+        del self._finished_tests[case_id]
+        return self._results.pop(case_id, None)
+
+    def pop_results(self) -> dict[int, list[TestResult]]:
+        """Return results of cases which not all tests finished (f.e. `-x`)."""
+        results, self._results = self._results, collections.defaultdict(list)
+        self._finished_tests.clear()
+        return dict(results)
@@ -0,0 +1,56 @@
+import time
+import typing
+
+from qase.api_client_v1.models.result_create import ResultCreate
+
+
+class QueuedResult(typing.NamedTuple):
+    """Test result waiting to be sent to Qase."""
+
+    result: ResultCreate
+    # Id of journal entry of result, `None` if results aren't journaled
+    entry_id: int | None = None
+
+
+class ResultsBuffer:
+    """Buffer of tests results waiting to be sent to Qase in bulk.
+
+    Buffer is considered ready for flush once it collected `batch_size`
+    results or once `flush_interval` seconds passed since previous flush.
+
+    """
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval: float,
+    ) -> None:
+        """Init buffer."""
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._results: list[QueuedResult] = []
+        self._last_flush = time.monotonic()
+
+    def __len__(self) -> int:
+        """Return number of buffered results."""
+        return len(self._results)
+
+    @property
+    def should_flush(self) -> bool:
+        """Check if buffered results should be sent to Qase."""
+        if not self._results:
+            return False
+        return (
+            len(self._results) >= self._batch_size
+            or time.monotonic() - self._last_flush >= self._flush_interval
+        )
+
+    def add(self, result: QueuedResult) -> None:
+        """Add test result to buffer."""
+        self._results.append(result)
+
+    def pop_results(self) -> list[QueuedResult]:
+        """Return all buffered results and clear buffer."""
+        results, self._results = self._results, []
+        self._last_flush = time.monotonic()
+        return results
@@ -0,0 +1,130 @@
+import collections.abc
+import logging
+import queue
+import threading
+import time
+
+from . import results_buffer
+
+# Marker that signifies that there will be no more results in queue
+_STOP = object()
+
+
+class BackgroundResultsSender:
+    """Send tests results to Qase in background thread.
+
+    Results are put into bounded queue, so tests don't wait for Qase
+    responses. Worker thread takes results from queue, collects them in
+    buffer and sends them in bulk. If queue is full, putting new result
+    blocks until worker takes some results from queue.
+
+    """
+
+    def __init__(
+        self,
+        send_results: collections.abc.Callable[
+            [list[results_buffer.QueuedResult]],
+            None,
+        ],
+        batch_size: int,
+        flush_interval: float,
+        queue_size: int,
+    ) -> None:
+        """Init sender."""
+        self._logger = logging.getLogger("qase")
+        self._send_results = send_results
+        self._flush_interval = flush_interval
+        self._buffer = results_buffer.ResultsBuffer(
+            batch_size=batch_size,
+            flush_interval=flush_interval,
+        )
+        self._queue: queue.Queue[object] = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(
+            target=self._run,
+            name="qase-results-sender",
+            daemon=True,
+        )
+        self.peak_queue_depth = 0
+        self.drain_time = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Return number of results which are not sent yet."""
+        return self._queue.qsize() + len(self._buffer)
+
+    def start(self) -> None:
+        """Start worker thread."""
+        self._thread.start()
+
+    def put(self, result: results_buffer.QueuedResult) -> None:
+        """Put test result to queue for sending."""
+        self._queue.put(result)
+        self.peak_queue_depth = max(
+            self.peak_queue_depth,
+            self._queue.qsize(),
+        )
+
+    def stop(self, timeout: float) -> bool:
+        """Send remaining results and stop worker thread.
+
+        Return `False` if worker didn't manage to send remaining results
+        in `timeout` seconds.
+
+        """
+        started_at = time.monotonic()
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            self._set_drain_time(time.monotonic() - started_at)
+            return False
+        self._thread.join(
+            timeout=max(timeout - (time.monotonic() - started_at), 0),
+        )
+        self._set_drain_time(time.monotonic() - started_at)
+        return not self._thread.is_alive()
+
+    def merge(self, peak_queue_depth: int, drain_time: float) -> None:
+        """Add statistics of sender of other process (f.e. xdist worker).
+
+        The largest queue depth and drain time of all senders are kept.
+
+        """
+        self.peak_queue_depth = max(self.peak_queue_depth, peak_queue_depth)
+        self._set_drain_time(drain_time)
+
+    def _set_drain_time(self, drain_time: float) -> None:
+        """Keep the largest drain time, since senders drain in parallel."""
+        self.drain_time = max(self.drain_time, drain_time)
+
+    def _run(self) -> None:
+        """Take results from queue and send them in bulk."""
+        while True:
+            try:
+                result = self._queue.get(timeout=self._flush_interval)
+            except queue.Empty:
+                result = None
+
+            if result is _STOP:
+                self._flush()
+                return
+            if isinstance(result, results_buffer.QueuedResult):
+                self._buffer.add(result)
+            if self._buffer.should_flush:
+                self._flush()
+
+    def _flush(self) -> None:
+        """Send buffered results.
+
+        Errors are only logged, so worker thread keeps running and sends
+        other results.
+
+        """
+        results = self._buffer.pop_results()
+        if not results:
+            return
+        try:
+            self._send_results(results)
+        except Exception:
+            self._logger.exception(
+                msg=f"Can't send {len(results)} results to Qase",
+            )
@@ -0,0 +1,199 @@
+import collections.abc
+import io
+import json
+import os
+import pathlib
+import re
+import shutil
+import tempfile
+import typing
+import uuid
+
+from qase.api_client_v1.models.result_create import ResultCreate
+from qase.api_client_v1.models.run_create import RunCreate
+
+# Spooled files are referenced in results with placeholders, which are
+# replaced with real URLs on upload
+SPOOLED_FILE_URL_TEMPLATE = "spool://{file_id}"
+SPOOLED_FILE_URL_PATTERN = re.compile(r"spool://(?P<file_id>[0-9a-f]{32})")
+
+
+class ResultsSpool:
+    """Local append-only storage of test run data, results and files.
+
+    Spool allows to run tests without requests to Qase and upload results
+    later with `pytest-qaseio-upload` command. Each process appends data to
+    its own files, so spool can be shared by several processes (f.e. xdist
+    workers).
+
+    Progress of upload (created test run, uploaded files and sent chunks of
+    results) is saved to spool too, so interrupted upload is resumed
+    instead of being repeated.
+
+    """
+
+    def __init__(self, path: pathlib.Path) -> None:
+        """Prepare paths of spool files."""
+        self.path = path
+        self._run_file = path / "run.json"
+        self._results_file = path / f"results-{os.getpid()}.jsonl"
+        self._files_index_file = path / f"files-{os.getpid()}.jsonl"
+        self._files_dir = path / "files"
+        self._file_storage_file = path / "file-storage.json"
+        self._uploaded_run_file = path / "uploaded-run.json"
+        self._uploaded_files_file = path / "uploaded-files.jsonl"
+        self._uploaded_results_file = path / "uploaded-results.jsonl"
+
+    def save_run(self, run_data: RunCreate) -> None:
+        """Save data to create test run."""
+        self._write_file(path=self._run_file, content=run_data.to_json())
+
+    def has_run(self) -> bool:
+        """Check if spool already contains test run of some session."""
+        return self._run_file.exists()
+
+    def load_run(self) -> RunCreate:
+        """Load data to create test run."""
+        return RunCreate.from_json(self._run_file.read_text())  # type: ignore
+
+    def save_file_storage(self, file_storage: str) -> None:
+        """Save name of file storage to upload spooled files to."""
+        self._write_file(
+            path=self._file_storage_file,
+            content=json.dumps({"name": file_storage}),
+        )
+
+    def load_file_storage(self) -> str | None:
+        """Load name of file storage to upload spooled files to."""
+        if not self._file_storage_file.exists():
+            return None
+        return json.loads(self._file_storage_file.read_text())["name"]
+
+    def save_uploaded_run(self, run_id: int) -> None:
+        """Save id of test run created on upload."""
+        self._write_file(
+            path=self._uploaded_run_file,
+            content=json.dumps({"id": run_id}),
+        )
+
+    def load_uploaded_run(self) -> int | None:
+        """Load id of test run created on previous upload."""
+        if not self._uploaded_run_file.exists():
+            return None
+        return json.loads(self._uploaded_run_file.read_text())["id"]
+
+    def save_results(self, results: list[ResultCreate]) -> None:
+        """Append tests results to spool."""
+        self._append_lines(
+            path=self._results_file,
+            lines=[result.to_json() for result in results],
+        )
+
+    def load_results(self) -> collections.abc.Iterator[ResultCreate]:
+        """Load tests results saved by all processes."""
+        for line in self._read_lines(pattern="results-*.jsonl"):
+            yield ResultCreate.from_json(line)  # type: ignore
+
+    def save_file(self, content: bytes, filename: str) -> str:
+        """Save file to spool and return its placeholder URL."""
+        return self.save_file_stream(
+            file=io.BytesIO(content),
+            filename=filename,
+        )
+
+    def save_file_stream(self, file: typing.BinaryIO, filename: str) -> str:
+        """Copy file object to spool and return its placeholder URL."""
+        file_id = uuid.uuid4().hex
+        self._files_dir.mkdir(parents=True, exist_ok=True)
+        with (self._files_dir / file_id).open(mode="wb") as spooled_file:
+            shutil.copyfileobj(file, spooled_file)
+        self._append_lines(
+            path=self._files_index_file,
+            lines=[json.dumps({"id": file_id, "filename": filename})],
+        )
+        return SPOOLED_FILE_URL_TEMPLATE.format(file_id=file_id)
+
+    def load_files(self) -> dict[str, tuple[str, pathlib.Path]]:
+        """Return mapping of spooled files ids and their names and paths."""
+        files = {}
+        for line in self._read_lines(pattern="files-*.jsonl"):
+            spooled_file = json.loads(line)
+            files[spooled_file["id"]] = (
+                spooled_file["filename"],
+                self._files_dir / spooled_file["id"],
+            )
+        return files
+
+    def save_uploaded_file(self, file_id: str, url: str) -> None:
+        """Save URL of uploaded spooled file."""
+        self._append_lines(
+            path=self._uploaded_files_file,
+            lines=[json.dumps({"id": file_id, "url": url})],
+        )
+
+    def load_uploaded_files(self) -> dict[str, str]:
+        """Return mapping of ids and URLs of already uploaded files."""
+        uploaded_files = {}
+        for line in self._read_lines(pattern=self._uploaded_files_file.name):
+            uploaded_file = json.loads(line)
+            uploaded_files[uploaded_file["id"]] = uploaded_file["url"]
+        return uploaded_files
+
+    def save_uploaded_results(self, start: int) -> None:
+        """Save position of sent chunk of results."""
+        self._append_lines(
+            path=self._uploaded_results_file,
+            lines=[json.dumps({"start": start})],
+        )
+
+    def load_uploaded_results(self) -> set[int]:
+        """Return positions of already sent chunks of results."""
+        return {
+            json.loads(line)["start"]
+            for line in self._read_lines(
+                pattern=self._uploaded_results_file.name,
+            )
+        }
+
+    def _write_file(self, path: pathlib.Path, content: str) -> None:
+        """Replace spool file atomically, so it's never partially written."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="w",
+            dir=self.path,
+            prefix=f"{path.name}.",
+            delete=False,
+        ) as tmp_file:
+            tmp_file.write(content)
+        pathlib.Path(tmp_file.name).replace(path)
+
+    @staticmethod
+    def _append_lines(path: pathlib.Path, lines: list[str]) -> None:
+        """Append lines to spool file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open(mode="a") as spool_file:
+            spool_file.writelines(f"{line}\n" for line in lines)
+
+    def _read_lines(self, pattern: str) -> collections.abc.Iterator[str]:
+        """Read non-empty lines from spool files matching pattern."""
+        for path in sorted(self.path.glob(pattern)):
+            with path.open() as spool_file:
+                for line in spool_file:
+                    if line.strip():
+                        yield line
+
+
+class SpoolFileStorage:
+    """Save files to results spool instead of uploading them."""
+
+    def __init__(self, spool: ResultsSpool) -> None:
+        """Save spool."""
+        self._spool = spool
+
+    def save_file_obj(self, content: bytes, filename: str) -> str:
+        """Save file to spool and return its placeholder URL."""
+        return self._spool.save_file(content=content, filename=filename)
+
+    def save_file_stream(self, file: typing.BinaryIO, filename: str) -> str:
+        """Copy file object to spool and return its placeholder URL."""
+        return self._spool.save_file_stream(file=file, filename=filename)
@@ -1,8 +1,22 @@
+import collections.abc
+import io
+import mimetypes
+import os
+import pathlib
+import shutil
+import time
 import typing
+import urllib.parse
 
-from qase.api_client_v1 import configuration as qaseio_config
 from qase.api_client_v1.api.attachments_api import AttachmentsApi
-from qase.api_client_v1.api_client import ApiClient
+
+from . import (
+    api_client,
+    artifacts,
+    files_cache,
+    metrics,
+    plugin_exceptions,
+)
 
 
 class FileStorage(typing.Protocol):
@@ -13,6 +27,59 @@ class FileStorage(typing.Protocol):
         ...
 
 
+@typing.runtime_checkable
+class BatchFileStorage(FileStorage, typing.Protocol):
+    """Protocol for file uploaders able to upload several files at once."""
+
+    def save_files(
+        self,
+        files: collections.abc.Mapping[str, bytes],
+    ) -> dict[str, str]:
+        """Upload files to storage and return mapping of filenames and URLs.
+
+        `files` is mapping of filenames and files content.
+
+        """
+        ...
+
+
+@typing.runtime_checkable
+class StreamFileStorage(FileStorage, typing.Protocol):
+    """Protocol for file uploaders able to upload files from file objects.
+
+    File is read by chunks, so large files (f.e. screenshots spooled to disk)
+    are never fully copied to memory.
+
+    """
+
+    def save_file_stream(self, file: typing.BinaryIO, filename: str) -> str:
+        """Upload file from file object to storage and return URL."""
+        ...
+
+
+def save_file_stream(
+    file_storage: FileStorage,
+    file: typing.BinaryIO,
+    filename: str,
+) -> str:
+    """Upload file from file object to any storage and return URL.
+
+    File is read to memory only if storage can't upload file objects.
+
+    """
+    if isinstance(file_storage, StreamFileStorage):
+        return file_storage.save_file_stream(file=file, filename=filename)
+    return file_storage.save_file_obj(content=file.read(), filename=filename)
+
+
+def get_file_size(file: typing.BinaryIO) -> int:
+    """Get number of bytes left in file object."""
+    position = file.tell()
+    size = file.seek(0, os.SEEK_END) - position
+    file.seek(position)
+    return size
+
+
 class QaseFileStorage:
     """Upload files to Qase S3 bucket as attachment."""
 
@@ -20,29 +87,474 @@ class QaseFileStorage:
         self,
         qase_token: str,
         qase_project_code: str,
+        connection_pool_size: int | None = None,
+        qase_host: str | None = None,
     ) -> None:
         """Prepare ApiClient for qase io using credentials."""
-        self._client = ApiClient(
-            configuration=qaseio_config.Configuration(
-                api_key={
-                    "TokenAuth": qase_token,
-                },
+        self._attachments_api = AttachmentsApi(
+            api_client.get_api_client(
+                token=qase_token,
+                connection_pool_size=connection_pool_size,
+                host=qase_host,
             ),
         )
         self._project_code = qase_project_code
 
     def save_file_obj(self, content: bytes, filename: str) -> str:
         """Upload file to Qase.io S3 bucket via attachment API."""
-        attachment_response_result = (
-            AttachmentsApi(
-                self._client,
+        attachment_response_result = self._attachments_api.upload_attachment(
+            code=self._project_code,
+            file=[content],
+        ).result
+        assert attachment_response_result is not None  # noqa: S101
+
+        return typing.cast(str, attachment_response_result[0].url)
+
+    def save_files(
+        self,
+        files: collections.abc.Mapping[str, bytes],
+    ) -> dict[str, str]:
+        """Upload files to Qase.io S3 bucket with single request."""
+        filenames = list(files)
+        attachment_response_result = self._attachments_api.upload_attachment(
+            code=self._project_code,
+            file=[
+                (pathlib.PurePosixPath(filename).name, files[filename])
+                for filename in filenames
+            ],
+        ).result
+        assert attachment_response_result is not None  # noqa: S101
+
+        # Qase returns attachments in the same order as uploaded files
+        return {
+            filename: typing.cast(str, attachment.url)
+            for filename, attachment in zip(
+                filenames,
+                attachment_response_result,
+                strict=True,
             )
-            .upload_attachment(
-                code=self._project_code,
-                file=[content],
+        }
+
+
+class LocalFileStorage:
+    """Save files to local directory.
+
+    Directory can be served by web server (then its URL should be passed as
+    `base_url`) or collected as artifacts of CI job, otherwise `file://`
+    URLs are returned.
+
+    """
+
+    def __init__(self, path: pathlib.Path, base_url: str = "") -> None:
+        """Save directory of files and its URL."""
+        self.path = path
+        self.base_url = base_url.rstrip("/")
+
+    def save_file_obj(self, content: bytes, filename: str) -> str:
+        """Write file to directory and return its URL."""
+        return self.save_file_stream(
+            file=io.BytesIO(content),
+            filename=filename,
+        )
+
+    def save_file_stream(self, file: typing.BinaryIO, filename: str) -> str:
+        """Copy file object to directory by chunks and return its URL."""
+        file_path = self._get_file_path(filename)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        # File is written under temporary name, so readers never get it
+        # partially written
+        tmp_file_path = file_path.with_name(f".{file_path.name}.tmp")
+        with tmp_file_path.open(mode="wb") as tmp_file:
+            shutil.copyfileobj(file, tmp_file)
+        tmp_file_path.replace(file_path)
+        return self.get_url(filename)
+
+    def get_url(self, filename: str) -> str:
+        """Get URL of saved file."""
+        if self.base_url:
+            return f"{self.base_url}/{urllib.parse.quote(filename)}"
+        return self._get_file_path(filename).as_uri()
+
+    def _get_file_path(self, filename: str) -> pathlib.Path:
+        """Get path of file, making sure it's inside of directory."""
+        root = self.path.resolve()
+        file_path = (root / filename).resolve()
+        if not file_path.is_relative_to(root):
+            raise ValueError(f"{filename} is outside of {root}")
+        return file_path
+
+
+class S3FileStorage:
+    """Upload files to S3 compatible storage (AWS S3, MinIO, etc.).
+
+    Files larger than `multipart_threshold` are uploaded with multipart
+    upload, their parts of `multipart_chunk_size` bytes are uploaded in
+    parallel. Files are stored by their filenames, so their URLs are stable:
+    `public_url` (f.e. CDN in front of bucket) is used as base of URLs if
+    it's passed, otherwise URLs of bucket are used.
+
+    Requires `boto3`, which is installed with `pytest-qaseio[s3]`.
+
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: str | None = None,
+        public_url: str | None = None,
+        multipart_threshold: int = 8 * 1024 * 1024,
+        multipart_chunk_size: int = 8 * 1024 * 1024,
+        max_concurrency: int = 4,
+    ) -> None:
+        """Prepare S3 client.
+
+        Credentials and region are taken by `boto3` from environment
+        (`AWS_ACCESS_KEY_ID`, `AWS_SECRET_ACCESS_KEY`, `AWS_DEFAULT_REGION`,
+        etc.).
+
+        """
+        try:
+            import boto3
+            import boto3.s3.transfer
+        except ImportError as error:
+            raise plugin_exceptions.MissingDependency(
+                message=(
+                    "boto3 is required to upload files to S3, install it "
+                    "with `pip install pytest-qaseio[s3]`"
+                ),
+            ) from error
+
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.public_url = public_url
+        self._client = boto3.client("s3", endpoint_url=endpoint_url)
+        self._transfer_config = boto3.s3.transfer.TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunk_size,
+            max_concurrency=max_concurrency,
+            use_threads=max_concurrency > 1,
+        )
+
+    def save_file_obj(self, content: bytes, filename: str) -> str:
+        """Upload file to bucket and return its URL."""
+        return self.save_file_stream(
+            file=io.BytesIO(content),
+            filename=filename,
+        )
+
+    def save_file_stream(self, file: typing.BinaryIO, filename: str) -> str:
+        """Upload file object to bucket by chunks and return its URL."""
+        self._client.upload_fileobj(
+            Fileobj=file,
+            Bucket=self.bucket,
+            Key=filename,
+            ExtraArgs=self._get_extra_args(filename),
+            Config=self._transfer_config,
+        )
+        return self.get_url(filename)
+
+    def get_url(self, filename: str) -> str:
+        """Get URL of uploaded file."""
+        key = urllib.parse.quote(filename)
+        if self.public_url:
+            return f"{self.public_url.rstrip('/')}/{key}"
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{key}"
+        if region := self._client.meta.region_name:
+            return f"https://{self.bucket}.s3.{region}.amazonaws.com/{key}"
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
+    @staticmethod
+    def _get_extra_args(filename: str) -> dict[str, str]:
+        """Get content type and encoding of file, so browsers can show it.
+
+        Gzipped files (f.e. `html.html.gz`) are served with encoding, so
+        browsers decompress them.
+
+        """
+        content_type, encoding = mimetypes.guess_type(filename)
+        extra_args = {
+            "ContentType": content_type or "application/octet-stream",
+        }
+        if encoding:
+            extra_args["ContentEncoding"] = encoding
+        return extra_args
+
+
+class DeduplicatingFileStorage:
+    """Wrapper for file storage which skips uploading of identical files."""
+
+    def __init__(
+        self,
+        file_storage: FileStorage,
+        cache: files_cache.UploadedFilesCache,
+    ) -> None:
+        """Save wrapped storage and cache of uploaded files."""
+        self._file_storage = file_storage
+        self.cache = cache
+
+    def save_file_obj(self, content: bytes, filename: str) -> str:
+        """Return URL of identical file or upload file to storage."""
+        key = self.cache.get_key(content=content, filename=filename)
+        if url := self.cache.get(key):
+            return url
+        url = self._file_storage.save_file_obj(
+            content=content,
+            filename=filename,
+        )
+        self.cache.set(key, url)
+        return url
+
+    def save_file_stream(self, file: typing.BinaryIO, filename: str) -> str:
+        """Return URL of identical file or upload file object to storage."""
+        position = file.tell()
+        key = self.cache.get_file_key(file=file, filename=filename)
+        if url := self.cache.get(key):
+            return url
+        file.seek(position)
+        url = save_file_stream(
+            file_storage=self._file_storage,
+            file=file,
+            filename=filename,
+        )
+        self.cache.set(key, url)
+        return url
+
+
+class DeduplicatingBatchFileStorage(DeduplicatingFileStorage):
+    """Wrapper for batch file storage which skips identical files."""
+
+    _file_storage: BatchFileStorage
+
+    def save_files(
+        self,
+        files: collections.abc.Mapping[str, bytes],
+    ) -> dict[str, str]:
+        """Upload only files which weren't uploaded before."""
+        keys = {
+            filename: self.cache.get_key(content=content, filename=filename)
+            for filename, content in files.items()
+        }
+        urls: dict[str, str] = {}
+        for filename, key in keys.items():
+            if url := self.cache.get(key):
+                urls[filename] = url
+        new_files = {
+            filename: content
+            for filename, content in files.items()
+            if filename not in urls
+        }
+        if not new_files:
+            return urls
+        new_urls = self._file_storage.save_files(files=new_files)
+        for filename, url in new_urls.items():
+            self.cache.set(keys[filename], url)
+        return urls | new_urls
+
+
+def deduplicate(
+    file_storage: FileStorage,
+    cache: files_cache.UploadedFilesCache,
+) -> DeduplicatingFileStorage:
+    """Wrap file storage to skip uploading of identical files."""
+    if isinstance(file_storage, BatchFileStorage):
+        return DeduplicatingBatchFileStorage(
+            file_storage=file_storage,
+            cache=cache,
+        )
+    return DeduplicatingFileStorage(file_storage=file_storage, cache=cache)
+
+
+class MeasuredFileStorage:
+    """Wrapper for file storage which records metrics of uploads."""
+
+    def __init__(
+        self,
+        file_storage: FileStorage,
+        api_metrics: metrics.ApiMetrics,
+    ) -> None:
+        """Save wrapped storage and metrics."""
+        self._file_storage = file_storage
+        self.metrics = api_metrics
+
+    def save_file_obj(self, content: bytes, filename: str) -> str:
+        """Upload file to wrapped storage and record metrics."""
+        started_at = time.perf_counter()
+        try:
+            url = self._file_storage.save_file_obj(
+                content=content,
+                filename=filename,
+            )
+        except Exception as error:
+            self.metrics.record(
+                operation="save_file_obj",
+                duration=time.perf_counter() - started_at,
+                bytes_sent=len(content),
+                error=error,
             )
-            .result
+            raise
+        self.metrics.record(
+            operation="save_file_obj",
+            duration=time.perf_counter() - started_at,
+            bytes_sent=len(content),
         )
-        assert attachment_response_result is not None  # noqa: S101
+        return url
 
-        return typing.cast(str, attachment_response_result[0].url)
+    def save_file_stream(self, file: typing.BinaryIO, filename: str) -> str:
+        """Upload file object to wrapped storage and record metrics."""
+        bytes_sent = get_file_size(file)
+        started_at = time.perf_counter()
+        try:
+            url = save_file_stream(
+                file_storage=self._file_storage,
+                file=file,
+                filename=filename,
+            )
+        except Exception as error:
+            self.metrics.record(
+                operation="save_file_stream",
+                duration=time.perf_counter() - started_at,
+                bytes_sent=bytes_sent,
+                error=error,
+            )
+            raise
+        self.metrics.record(
+            operation="save_file_stream",
+            duration=time.perf_counter() - started_at,
+            bytes_sent=bytes_sent,
+        )
+        return url
+
+
+class MeasuredBatchFileStorage(MeasuredFileStorage):
+    """Wrapper for batch file storage which records metrics of uploads."""
+
+    _file_storage: BatchFileStorage
+
+    def save_files(
+        self,
+        files: collections.abc.Mapping[str, bytes],
+    ) -> dict[str, str]:
+        """Upload files to wrapped storage and record metrics."""
+        bytes_sent = sum(len(content) for content in files.values())
+        started_at = time.perf_counter()
+        try:
+            urls = self._file_storage.save_files(files=files)
+        except Exception as error:
+            self.metrics.record(
+                operation="save_files",
+                duration=time.perf_counter() - started_at,
+                bytes_sent=bytes_sent,
+                error=error,
+            )
+            raise
+        self.metrics.record(
+            operation="save_files",
+            duration=time.perf_counter() - started_at,
+            bytes_sent=bytes_sent,
+        )
+        return urls
+
+
+def measure(
+    file_storage: FileStorage,
+    api_metrics: metrics.ApiMetrics,
+) -> MeasuredFileStorage:
+    """Wrap file storage to record metrics of uploads."""
+    if isinstance(file_storage, BatchFileStorage):
+        return MeasuredBatchFileStorage(
+            file_storage=file_storage,
+            api_metrics=api_metrics,
+        )
+    return MeasuredFileStorage(
+        file_storage=file_storage,
+        api_metrics=api_metrics,
+    )
+
+
+class ProcessingFileStorage:
+    """Wrapper for file storage which reduces size of files before upload."""
+
+    def __init__(
+        self,
+        file_storage: FileStorage,
+        processor: artifacts.ArtifactsProcessor,
+    ) -> None:
+        """Save wrapped storage and processor of files."""
+        self._file_storage = file_storage
+        self.processor = processor
+
+    def save_file_obj(self, content: bytes, filename: str) -> str:
+        """Process file and upload it to wrapped storage."""
+        content, filename = self.processor.process(
+            content=content,
+            filename=filename,
+        )
+        return self._file_storage.save_file_obj(
+            content=content,
+            filename=filename,
+        )
+
+    def save_file_stream(self, file: typing.BinaryIO, filename: str) -> str:
+        """Process file object and upload it to wrapped storage."""
+        processed_file, processed_filename = self.processor.process_file(
+            file=file,
+            filename=filename,
+        )
+        try:
+            return save_file_stream(
+                file_storage=self._file_storage,
+                file=processed_file,
+                filename=processed_filename,
+            )
+        finally:
+            if processed_file is not file:
+                processed_file.close()
+
+
+class ProcessingBatchFileStorage(ProcessingFileStorage):
+    """Wrapper for batch file storage which reduces size of files."""
+
+    _file_storage: BatchFileStorage
+
+    def save_files(
+        self,
+        files: collections.abc.Mapping[str, bytes],
+    ) -> dict[str, str]:
+        """Process files and upload them to wrapped storage.
+
+        Returned URLs are mapped to original filenames.
+
+        """
+        # Mapping of new filenames and original ones
+        filenames: dict[str, str] = {}
+        processed_files: dict[str, bytes] = {}
+        for filename, content in files.items():
+            processed_content, processed_filename = self.processor.process(
+                content=content,
+                filename=filename,
+            )
+            filenames[processed_filename] = filename
+            processed_files[processed_filename] = processed_content
+        urls = self._file_storage.save_files(files=processed_files)
+        return {
+            filenames[filename]: url
+            for filename, url in urls.items()
+            if filename in filenames
+        }
+
+
+def process(
+    file_storage: FileStorage,
+    processor: artifacts.ArtifactsProcessor,
+) -> ProcessingFileStorage:
+    """Wrap file storage to reduce size of files before upload."""
+    if isinstance(file_storage, BatchFileStorage):
+        return ProcessingBatchFileStorage(
+            file_storage=file_storage,
+            processor=processor,
+        )
+    return ProcessingFileStorage(
+        file_storage=file_storage,
+        processor=processor,
+    )
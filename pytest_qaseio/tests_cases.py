@@ -0,0 +1,50 @@
+import collections
+import collections.abc
+
+import pytest
+
+# Case id of item
+_case_id_key = pytest.StashKey[int]()
+
+
+class TestsCases:
+    """Compact mapping of collected tests to their cases ids.
+
+    Case id is kept in item's stash instead of per session mapping of
+    nodeids, and cases ids are interned, so items of same case share single
+    `int`. This matters for huge test suites run by many xdist workers,
+    since each worker collects all tests.
+
+    """
+
+    __slots__ = ("_cases_ids", "_tests_per_case")
+
+    # Prevent pytest from collecting class as tests
+    __test__ = False
+
+    def __init__(self) -> None:
+        """Init empty mapping."""
+        # Mapping of cases ids to themselves to intern them
+        self._cases_ids: dict[int, int] = {}
+        self._tests_per_case: collections.Counter[int] = collections.Counter()
+
+    @property
+    def tests_per_case(self) -> collections.abc.Mapping[int, int]:
+        """Return number of tests of each case."""
+        return self._tests_per_case
+
+    def add(self, item: pytest.Item, case_id: int | None) -> None:
+        """Map item to case id."""
+        if not case_id:
+            return
+        case_id = self._cases_ids.setdefault(case_id, case_id)
+        self._tests_per_case[case_id] += 1
+        item.stash[_case_id_key] = case_id
+
+    def get(self, item: pytest.Item) -> int | None:
+        """Get case id of item, `None` if item has no case."""
+        return item.stash.get(_case_id_key, None)
+
+    def __repr__(self) -> str:
+        """Return short representation of mapping."""
+        return f"{type(self).__name__}(<{len(self._tests_per_case)} cases>)"
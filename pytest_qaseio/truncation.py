@@ -0,0 +1,36 @@
+from . import constants
+
+# Separator of frames in pytest tracebacks
+FRAMES_SEPARATOR = b"\n_ _ "
+
+
+def truncate_text(text: str, max_size: int) -> str:
+    """Truncate text to max size in bytes keeping its head and failing frame.
+
+    Failing frame is the last frame of pytest traceback, which contains
+    assertion error, so it takes up to three quarters of size. If text isn't
+    traceback, its tail is kept instead. Omitted part is replaced with note
+    about number of truncated bytes.
+
+    """
+    content = text.encode("utf-8")
+    if len(content) <= max_size:
+        return text
+    note = constants.TRUNCATED_TEXT.format(size=len(content))
+    available_size = max(max_size - len(note.encode("utf-8")), 0)
+    # Note with exact number of truncated bytes is not longer than initial
+    note = constants.TRUNCATED_TEXT.format(
+        size=len(content) - available_size,
+    )
+
+    frame_start = content.rfind(FRAMES_SEPARATOR)
+    tail_size = (
+        available_size // 2
+        if frame_start == -1
+        else min(len(content) - frame_start, available_size * 3 // 4)
+    )
+    head_size = available_size - tail_size
+    # Multibyte characters cut in half are dropped
+    head = content[:head_size].decode("utf-8", errors="ignore")
+    tail = content[len(content) - tail_size :].decode("utf-8", errors="ignore")
+    return f"{head}{note}{tail}"
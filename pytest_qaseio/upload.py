@@ -0,0 +1,333 @@
+import argparse
+import concurrent.futures
+import logging
+import os
+import pathlib
+import sys
+import typing
+
+from qase.api_client_v1.models.result_create import ResultCreate
+from qase.api_client_v1.models.run_create import RunCreate
+
+from . import api_client, cases_index, spool, storage
+
+FILE_STORAGES = ("qase", "local", "s3")
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    parser = argparse.ArgumentParser(
+        prog="pytest-qaseio-upload",
+        description=(
+            "Create Qase test run and upload results spooled with "
+            "`--qase-spool` pytest option. Progress is saved to spool, so "
+            "rerun of command resumes interrupted upload"
+        ),
+    )
+    parser.add_argument(
+        "spool",
+        type=pathlib.Path,
+        help="Path to spool directory",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=8,
+        help="Number of concurrent uploads",
+    )
+    parser.add_argument(
+        "--api-retries",
+        type=int,
+        default=3,
+        help="Number of retries for Qase API requests",
+    )
+    parser.add_argument(
+        "--file-storage",
+        choices=FILE_STORAGES,
+        default=None,
+        help=(
+            "File storage to upload spooled files to, storage chosen for "
+            "spooled run is used by default"
+        ),
+    )
+    parser.add_argument(
+        "--local-storage-dir",
+        type=pathlib.Path,
+        default=pathlib.Path(".pytest-qaseio-files"),
+        help="Directory to save files to by `local` storage",
+    )
+    parser.add_argument(
+        "--local-storage-url",
+        default="",
+        help="URL of directory of `local` storage",
+    )
+    parser.add_argument(
+        "--s3-multipart-chunk-size",
+        type=int,
+        default=8 * 1024 * 1024,
+        help="Size of parts in bytes for multipart upload to `s3` storage",
+    )
+    parser.add_argument(
+        "--s3-max-concurrency",
+        type=int,
+        default=4,
+        help="Max number of parts of file uploaded to `s3` in parallel",
+    )
+    return parser.parse_args(argv)
+
+
+def get_file_storage(
+    file_storage_name: str,
+    args: argparse.Namespace,
+) -> storage.FileStorage:
+    """Create file storage to upload spooled files to.
+
+    `s3` storage requires `QASE_S3_BUCKET` environment variable, like in
+    pytest plugin.
+
+    """
+    match file_storage_name:
+        case "qase":
+            return storage.QaseFileStorage(
+                qase_token=os.environ["QASE_TOKEN"],
+                qase_project_code=os.environ["QASE_PROJECT_CODE"],
+                connection_pool_size=args.workers,
+                qase_host=os.getenv("QASE_API_HOST"),
+            )
+        case "local":
+            return storage.LocalFileStorage(
+                path=args.local_storage_dir,
+                base_url=args.local_storage_url,
+            )
+        case "s3":
+            return storage.S3FileStorage(
+                bucket=os.environ["QASE_S3_BUCKET"],
+                endpoint_url=os.getenv("QASE_S3_ENDPOINT_URL"),
+                public_url=os.getenv("QASE_S3_PUBLIC_URL"),
+                multipart_threshold=args.s3_multipart_chunk_size,
+                multipart_chunk_size=args.s3_multipart_chunk_size,
+                max_concurrency=args.s3_max_concurrency,
+            )
+    raise ValueError(
+        f"Spooled files can't be uploaded to `{file_storage_name}` storage, "
+        f"use `--file-storage` to choose one of {', '.join(FILE_STORAGES)}",
+    )
+
+
+def upload_files(
+    file_storage: storage.FileStorage,
+    results_spool: spool.ResultsSpool,
+    files: dict[str, tuple[str, pathlib.Path]],
+    workers: int,
+) -> tuple[dict[str, str], int]:
+    """Upload spooled files and return their URLs and number of failures.
+
+    URL of each uploaded file is saved to spool right away, so it isn't
+    uploaded again on rerun.
+
+    """
+    logger = logging.getLogger("qase")
+
+    def upload_file(filename: str, path: pathlib.Path) -> str:
+        with path.open(mode="rb") as file:
+            return storage.save_file_stream(
+                file_storage=file_storage,
+                file=file,
+                filename=filename,
+            )
+
+    urls: dict[str, str] = {}
+    failed_files = 0
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=workers,
+    ) as executor:
+        futures = {
+            executor.submit(upload_file, filename, path): file_id
+            for file_id, (filename, path) in files.items()
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                url = future.result()
+            except Exception:
+                failed_files += 1
+                logger.exception(msg="Can't upload spooled file to storage")
+                continue
+            urls[futures[future]] = url
+            results_spool.save_uploaded_file(
+                file_id=futures[future],
+                url=url,
+            )
+    return urls, failed_files
+
+
+def replace_files_urls(
+    result: ResultCreate,
+    files_urls: dict[str, str],
+) -> ResultCreate:
+    """Replace placeholders of spooled files in result with real URLs."""
+    if result.comment:
+        result.comment = spool.SPOOLED_FILE_URL_PATTERN.sub(
+            lambda match: files_urls.get(match["file_id"], ""),
+            result.comment,
+        )
+    return result
+
+
+def validate_cases_ids(
+    client: api_client.QaseClient,
+    run_data: RunCreate,
+    results: list[ResultCreate],
+    workers: int,
+) -> tuple[cases_index.CasesIndex, list[int]]:
+    """Check that spooled cases exist in project.
+
+    Cases aren't validated by pytest when results are spooled, so they are
+    validated on upload. Return ids of existing cases and invalid ones.
+
+    """
+    spooled_cases_ids = set(run_data.cases or []) | {
+        result.case_id for result in results if result.case_id is not None
+    }
+    cases_ids = client.load_existing_cases_ids(
+        cases_ids=spooled_cases_ids,
+        max_workers=workers,
+    )
+    invalid_cases_ids = sorted(
+        case_id for case_id in spooled_cases_ids if case_id not in cases_ids
+    )
+    if invalid_cases_ids:
+        logging.getLogger("qase").error(
+            "Cases with ids "
+            f"{', '.join(str(case_id) for case_id in invalid_cases_ids)} "
+            "don't exist in project, their results aren't uploaded",
+        )
+    return cases_ids, invalid_cases_ids
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Create test run and upload spooled results to Qase.
+
+    Files, test run and chunks of results uploaded by previous call are
+    taken from spool instead of being uploaded again. Test run isn't
+    created until all files are uploaded, so results are sent with links
+    to all files. Results of cases missing in project are skipped.
+
+    """
+    args = parse_args(argv)
+    # Handler for logger is added by `QaseClient`
+    logger = logging.getLogger("qase")
+    logger.setLevel(logging.INFO)
+
+    results_spool = spool.ResultsSpool(path=args.spool)
+    client = api_client.QaseClient(
+        token=os.environ["QASE_TOKEN"],
+        project_code=os.environ["QASE_PROJECT_CODE"],
+        retries=args.api_retries,
+        connection_pool_size=args.workers,
+        host=os.getenv("QASE_API_HOST"),
+    )
+    files_urls = results_spool.load_uploaded_files()
+    files = {
+        file_id: spooled_file
+        for file_id, spooled_file in results_spool.load_files().items()
+        if file_id not in files_urls
+    }
+    if files:
+        file_storage_name = (
+            args.file_storage or results_spool.load_file_storage() or "qase"
+        )
+        try:
+            file_storage = get_file_storage(
+                file_storage_name=file_storage_name,
+                args=args,
+            )
+        except ValueError as error:
+            logger.error(str(error))  # noqa: TRY400
+            return 1
+        uploaded_urls, failed_files = upload_files(
+            file_storage=file_storage,
+            results_spool=results_spool,
+            files=files,
+            workers=args.workers,
+        )
+        files_urls.update(uploaded_urls)
+        logger.info(
+            f"Uploaded {len(uploaded_urls)} files to "
+            f"`{file_storage_name}` storage, {failed_files} uploads failed",
+        )
+        if failed_files:
+            logger.error(
+                "Results aren't uploaded, since some files aren't uploaded, "
+                "rerun command to retry",
+            )
+            return 1
+
+    run_data = results_spool.load_run()
+    results = [
+        replace_files_urls(result=result, files_urls=files_urls)
+        for result in results_spool.load_results()
+    ]
+    cases_ids, invalid_cases_ids = validate_cases_ids(
+        client=client,
+        run_data=run_data,
+        results=results,
+        workers=args.workers,
+    )
+
+    if run_id := results_spool.load_uploaded_run():
+        run = client.get_run(run_id=run_id)
+        logger.info(f"Resuming upload to test run {run.id}")
+    else:
+        if run_data.cases:
+            run_data.cases = [
+                case_id for case_id in run_data.cases if case_id in cases_ids
+            ]
+        run = client.create_run(run_data=run_data)
+        results_spool.save_uploaded_run(typing.cast(int, run.id))
+        logger.info(f"Created test run {run.id}")
+
+    # Chunks are identified by their positions, which don't change between
+    # calls, since spool files are only appended by pytest. Results of
+    # invalid cases are skipped within their chunks, so positions are kept
+    uploaded_chunks = results_spool.load_uploaded_results()
+    chunks = {
+        start: [
+            result
+            for result in results[start : start + client.bulk_results_limit]
+            if result.case_id in cases_ids
+        ]
+        for start in range(0, len(results), client.bulk_results_limit)
+        if start not in uploaded_chunks
+    }
+    uploaded_results = 0
+    failed_chunks = 0
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=args.workers,
+    ) as executor:
+        futures = {
+            executor.submit(
+                client.report_test_results_bulk,
+                run=run,
+                results=chunk,
+            ): start
+            for start, chunk in chunks.items()
+        }
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except Exception:
+                failed_chunks += 1
+                logger.exception(msg="Can't upload spooled results to Qase")
+                continue
+            results_spool.save_uploaded_results(start=futures[future])
+            uploaded_results += len(chunks[futures[future]])
+    logger.info(
+        f"Uploaded {uploaded_results} results in {len(chunks)} requests "
+        f"({len(uploaded_chunks)} requests were sent before), "
+        f"{failed_chunks} requests failed",
+    )
+    return int(bool(failed_chunks or invalid_cases_ids))
+
+
+if __name__ == "__main__":
+    sys.exit(main())